@@ -1,15 +1,46 @@
 from flask import Flask
-from .models import db
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///asset_manager.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.secret_key = 'your_secret_key_here'
+from .config import get_config
 
-db.init_app(app)
 
-with app.app_context():
-    db.create_all()
+def create_app(config=None, **settings):
+    """Build the application.
 
-# Import views (routes)
-from . import views
+    ``config`` is a profile name or a config class and defaults to
+    ASSET_MANAGER_ENV; keyword arguments override single settings.
+    Everything is imported here rather than at module level, so importing
+    the package (as the barcode pool processes do) stays cheap.
+    """
+    from .database import configure_engine
+    from .models import db
+    from .schema import install_schema, pending_changes
+    from .views import main
+    from . import barcodes, cli, metrics
+
+    app = Flask(__name__)
+    app.config.from_object(config if isinstance(config, type) else get_config(config))
+    app.config.update(settings)
+
+    db.init_app(app)
+    if app.config['METRICS_ENABLED']:
+        metrics.init_app(app)
+    barcodes.init_app(app)
+    cli.init_app(app)
+
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        if app.config['METRICS_ENABLED']:
+            metrics.instrument_engine(db.engine)
+        if app.config['AUTO_CREATE_SCHEMA']:
+            install_schema(db.engine)
+        else:
+            missing, stale = pending_changes(db.engine)
+            if missing or stale:
+                # Production never changes the schema on startup; say what
+                # to run instead of failing on the first query
+                names = [f'{column.table.name}.{column.name}' for column in missing] + [table.name for table in stale]
+                app.logger.error('Database schema is out of date (%s); run flask --app app upgrade-db',
+                                 ', '.join(names))
+
+    app.register_blueprint(main)
+    return app
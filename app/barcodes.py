@@ -0,0 +1,118 @@
+"""Barcode images, rendered on demand and cached in memory.
+
+The ``/barcode/<serial>.<png|svg>`` endpoint renders an image on its first
+request and keeps it in a per-process LRU bounded in bytes. The image is a
+pure function of the serial, the format and the library version, so the
+ETag is computed without rendering and browsers keep the image for good; a
+moved asset gets a new serial and so a new URL. Nothing is written to disk.
+
+Label sheets are drawn on a process pool (see labels.py), so Pillow work
+runs off the request thread and across several cores.
+
+python-barcode and Pillow are imported on the first render, not with the
+module, so processes that never draw a barcode do not pay for them.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from importlib.metadata import version
+from multiprocessing import get_context
+
+from flask import current_app
+
+from .metrics import BARCODE_RENDER_SECONDS
+
+
+MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def render_barcode(serial_number, fmt):
+    """Render ``serial_number`` in memory and return the image bytes."""
+    from barcode import Code128
+    from barcode.writer import ImageWriter, SVGWriter
+
+    with BARCODE_RENDER_SECONDS.time(format=fmt, source='inline'):
+        writer = ImageWriter() if fmt == 'png' else SVGWriter()
+        buffer = io.BytesIO()
+        Code128(serial_number, writer=writer).write(buffer)
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _library_version():
+    # Read from the package metadata so the ETag does not import the library
+    return version('python-barcode')
+
+
+def barcode_etag(serial_number, fmt):
+    # The image is a pure function of the serial, the format and the library
+    # version, so the tag can be computed without rendering anything
+    key = f'{_library_version()}:{fmt}:{serial_number}'
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class BarcodeCache:
+    """Thread-safe LRU of rendered images keyed by (serial, format), bounded in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def get_cache(app=None):
+    app = app or current_app
+    return app.extensions['barcode_cache']
+
+
+class BarcodePool:
+    """The process pool label sheets are drawn on, started on first use."""
+
+    def __init__(self, app):
+        self.processes = app.config['BARCODE_WORKERS'] or os.cpu_count()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn rather than fork: the web process is multi-threaded
+                    self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=get_context('spawn'))
+        return self._executor
+
+
+def get_pool(app=None):
+    app = app or current_app
+    return app.extensions['barcode_pool']
+
+
+def init_app(app):
+    app.extensions['barcode_pool'] = BarcodePool(app)
+    app.extensions['barcode_cache'] = BarcodeCache(app.config['BARCODE_CACHE_MAX_BYTES'])
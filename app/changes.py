@@ -0,0 +1,149 @@
+"""Append-only feed of changes to the asset register.
+
+Downstream systems (finance, the CMDB) keep their copy of the register in
+step by reading the ``AssetChange`` rows after the last ``seq`` they saw,
+instead of pulling every asset to look for differences. Every write to an
+asset or one of its maintenance windows adds a row in the same
+transaction: an ``after_flush`` hook covers ORM writes (registering,
+editing, scheduling and closing maintenance, the repair status sync), and
+the executemany paths (``bulk_insert``, the importer, ``move_assets``)
+call ``record_changes`` themselves because bulk statements bypass the
+flush.
+
+Each entry holds the new values of the fields that changed (every field
+for ``registered``) and the asset's ``version`` after the change, so a
+consumer applies entries in ``seq`` order and can tell when it has missed
+one. ``seq`` only grows, and entries must also become visible in ``seq``
+order, or a reader that has moved past a ``seq`` whose transaction has not
+committed yet never sees that entry. SQLite serialises writers, which
+guarantees it. On PostgreSQL, sequence values are handed out before commit,
+so ``record_changes`` first takes a transaction-scoped advisory lock: writes
+to the feed commit one at a time, in ``seq`` order. Other databases are
+rejected rather than risk a feed that silently skips entries.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import event, func, inspect, insert, select
+from sqlalchemy.orm import Session
+
+from .models import db, Asset, AssetChange, Maintenance
+
+ASSET_FIELDS = ('name', 'type', 'category_id', 'subcategory_id', 'location_id', 'sublocation_id', 'status',
+                'assigned_to', 'depreciation', 'purchased_on', 'purchase_cost', 'serial_number')
+MAINTENANCE_FIELDS = ('start_date', 'end_date', 'type', 'description')
+MOVE_FIELDS = ('location_id', 'sublocation_id', 'serial_number')
+
+# Rows per INSERT when seeding the feed
+SEED_BATCH_SIZE = 1000
+# PostgreSQL advisory lock key serialising writes to the feed
+FEED_LOCK_KEY = 0x61737365
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def asset_action(changed, status):
+    """The action recorded for an update touching the ``changed`` field names."""
+    if 'status' in changed and status == 'Disposed':
+        return 'disposed'
+    if any(name in changed for name in MOVE_FIELDS):
+        return 'moved'
+    return 'updated'
+
+
+def change_entry(asset_id, version, action, values, fields):
+    """Column dict for ``record_changes``; ``values`` is a mapping or an object with the ``fields``."""
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name)
+    return {'asset_id': asset_id, 'version': version, 'action': action,
+            'data': {name: _json_value(get(name)) for name in fields}}
+
+
+def registered_entries(asset_ids, rows):
+    """Entries for assets bulk inserted as ``rows``, given their new ids in the same order."""
+    return [change_entry(asset_id, 1, 'registered', row, [name for name in ASSET_FIELDS if name in row])
+            for asset_id, row in zip(asset_ids, rows)]
+
+
+def record_changes(connection, entries):
+    """Append entries to the feed; call inside the writing transaction."""
+    if not entries:
+        return
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        # Held until commit, so the next writer draws its seqs only after
+        # these are visible
+        connection.execute(select(func.pg_advisory_xact_lock(FEED_LOCK_KEY)))
+    elif dialect != 'sqlite':
+        raise RuntimeError(f'The change feed needs SQLite or PostgreSQL, not {dialect}')
+    connection.execute(insert(AssetChange), entries)
+
+
+def _maintenance_entry(window):
+    entry = change_entry(window.asset_id, None, 'maintenance', window, MAINTENANCE_FIELDS)
+    entry['data']['maintenance_id'] = window.id
+    return entry
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_changes(session, flush_context):
+    # new/dirty/deleted and the attribute history still hold the pre-flush
+    # state here, while ids and versions already have their new values
+    entries = []
+    for obj in session.new:
+        if isinstance(obj, Asset):
+            entries.append(change_entry(obj.id, obj.version, 'registered', obj, ASSET_FIELDS))
+        elif isinstance(obj, Maintenance):
+            entries.append(_maintenance_entry(obj))
+    for obj in session.dirty:
+        if not isinstance(obj, (Asset, Maintenance)) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        fields = ASSET_FIELDS if isinstance(obj, Asset) else MAINTENANCE_FIELDS
+        changed = [name for name in fields if state.attrs[name].history.has_changes()]
+        if not changed:
+            continue
+        if isinstance(obj, Asset):
+            entries.append(change_entry(obj.id, obj.version, asset_action(changed, obj.status), obj, changed))
+        else:
+            entries.append(_maintenance_entry(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Asset):
+            entries.append(change_entry(obj.id, obj.version, 'deleted', obj, ()))
+    record_changes(session.connection(), entries)
+
+
+def changes_since(since, limit):
+    """Up to ``limit`` entries with ``seq`` above ``since``, oldest first."""
+    return db.session.execute(
+        select(AssetChange).where(AssetChange.seq > since).order_by(AssetChange.seq).limit(limit)
+    ).scalars().all()
+
+
+def change_to_dict(change):
+    return {
+        'seq': change.seq,
+        'asset_id': change.asset_id,
+        'version': change.version,
+        'action': change.action,
+        'changed_at': change.changed_at.isoformat(),
+        'data': change.data,
+    }
+
+
+def seed_changes(engine):
+    """Start an empty feed with a ``registered`` entry per existing asset (first start after upgrading).
+
+    A consumer reading from ``since=0`` then gets the whole register.
+    """
+    columns = [Asset.id, Asset.version, *(getattr(Asset, name) for name in ASSET_FIELDS)]
+    with engine.begin() as connection:
+        if connection.execute(select(AssetChange.seq).limit(1)).first() is not None:
+            return
+        rows = connection.execute(select(*columns).order_by(Asset.id))
+        while True:
+            batch = rows.fetchmany(SEED_BATCH_SIZE)
+            if not batch:
+                break
+            record_changes(connection, [change_entry(row.id, row.version, 'registered', row, ASSET_FIELDS)
+                                        for row in batch])
@@ -0,0 +1,281 @@
+"""``flask`` commands for setting up, maintaining and benchmarking the database.
+
+Run them from the project directory as ``flask --app app <command>`` (or
+with ``FLASK_APP=app`` exported); ``flask --app app --help`` lists them.
+They run inside an application context built by ``create_app``, so
+``ASSET_MANAGER_ENV`` and ``DATABASE_URL`` apply as they do for the web
+app. The development tools import their modules only when they run.
+"""
+import json
+import sys
+import tempfile
+import time
+from datetime import date
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from .models import db, ensure_indexes, Asset
+from .schema import SchemaError, install_schema
+from .search import drop_search, install_search
+
+iso_date = click.DateTime(formats=['%Y-%m-%d'])
+
+
+def reset_database():
+    """Drop and recreate every table, index and the search index."""
+    db.drop_all()
+    drop_search(db.engine)
+    db.create_all()
+    ensure_indexes(db.engine)
+    install_search(db.engine)
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Drop and recreate all tables."""
+    reset_database()
+    click.echo("Database recreated successfully!")
+
+
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_db_command():
+    """Bring an existing database up to date without losing data."""
+    try:
+        added = install_schema(db.engine)
+    except SchemaError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f"Added columns: {', '.join(added)}" if added else "Columns already up to date.")
+    click.echo("Database upgraded successfully!")
+
+
+@click.command('load-data')
+@click.option('--directory', type=click.Path(exists=True, file_okay=False),
+              help='directory holding locations.csv, sublocations.csv, categories.csv and subcategories.csv')
+@with_appcontext
+def load_data_command(directory):
+    """Load the location and category reference data from CSV."""
+    from .reference_loader import DATA_DIR, load_reference_data
+    load_reference_data(directory or DATA_DIR)
+
+
+@click.command('import-assets')
+@click.argument('csv_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=None, help='rows per INSERT and commit')
+@with_appcontext
+def import_assets_command(csv_file, batch_size):
+    """Bulk import assets from a CSV file (exits 1 if any row is rejected)."""
+    from .importer import import_assets
+    with open(csv_file, 'rb') as file:
+        report = import_assets(file, batch_size=batch_size or current_app.config['IMPORT_BATCH_SIZE'])
+
+    for line_no, message in report.errors:
+        click.echo(f"  Line {line_no}: {message}")
+    click.echo(f"Imported {report.inserted} assets from {csv_file}"
+               + (f" ({len(report.errors)} rows rejected)" if report.errors else ""))
+    sys.exit(1 if report.errors else 0)
+
+
+@click.command('compute-depreciation')
+@click.option('--as-of', type=iso_date, default=None, help='snapshot date (YYYY-MM-DD), defaults to today')
+@with_appcontext
+def compute_depreciation_command(as_of):
+    """Compute or refresh a depreciation snapshot."""
+    from .depreciation import compute_snapshot
+    as_of = as_of.date() if as_of else date.today()
+    removed, added = compute_snapshot(as_of)
+    click.echo(f"Depreciation snapshot for {as_of}: {added} assets computed ({removed} stale rows replaced)")
+
+
+@click.command('rebuild-search')
+@with_appcontext
+def rebuild_search_command():
+    """Rebuild the full-text search index."""
+    from .search import rebuild_search_index, search_supported
+    if not search_supported(db.engine):
+        click.echo("Full-text search needs SQLite FTS5; nothing to rebuild.")
+        sys.exit(1)
+    count = rebuild_search_index()
+    click.echo(f"Search index rebuilt: {count} assets indexed")
+
+
+@click.command('reconcile-rollups')
+@click.option('--check', is_flag=True, help='only report drift, without rewriting the table (exits 1 on drift)')
+@with_appcontext
+def reconcile_rollups_command(check):
+    """Rebuild the asset rollup counts and report any drift."""
+    from .rollups import ROLLUP_KEYS, reconcile_rollups
+    drift = reconcile_rollups(fix=not check)
+    for key, stored, actual in drift:
+        click.echo(f"{dict(zip(ROLLUP_KEYS, key))}: stored {stored}, actual {actual}")
+    if not drift:
+        click.echo("Rollup counts match the asset table.")
+    elif check:
+        click.echo(f"{len(drift)} rollup rows have drifted; run without --check to rebuild.")
+        sys.exit(1)
+    else:
+        click.echo(f"Rebuilt rollup counts; {len(drift)} rows had drifted.")
+
+
+@click.command('sync-maintenance')
+@click.option('--today', type=iso_date, default=None, help='date to evaluate (YYYY-MM-DD), defaults to today')
+@with_appcontext
+def sync_maintenance_command(today):
+    """Set assets Under Repair while a maintenance window covers the date, and back to Active after."""
+    from .maintenance import sync_repair_status
+    today = today.date() if today else date.today()
+    opened, closed = sync_repair_status(today)
+    click.echo(f"Maintenance status for {today}: {opened} assets now Under Repair, {closed} back to Active")
+
+
+@click.command('print-labels')
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--id', 'asset_ids', type=int, multiple=True, help='asset id to print (repeatable); overrides the filters')
+@click.option('--status')
+@click.option('--location', type=int, help='location id')
+@click.option('--sublocation', type=int, help='sublocation id')
+@click.option('--category', type=int, help='category id')
+@click.option('--subcategory', type=int, help='subcategory id')
+@click.option('--layout', default=None, help='label stock layout (default: LABEL_LAYOUT)')
+@click.option('--dpi', type=int, default=None, help='print resolution (default: LABEL_DPI)')
+@with_appcontext
+def print_labels_command(output, asset_ids, status, location, sublocation, category, subcategory, layout, dpi):
+    """Write label sheets for the matching assets to OUTPUT (.pdf, or .zip of PNG sheets)."""
+    from .barcodes import get_pool
+    from .labels import LAYOUTS, iter_label_sheets, label_rows, sheets_in_flight
+
+    fmt = output.rsplit('.', 1)[-1].lower()
+    if fmt not in ('pdf', 'zip'):
+        raise click.BadParameter('must end in .pdf or .zip', param_hint='OUTPUT')
+    layout = layout or current_app.config['LABEL_LAYOUT']
+    if layout not in LAYOUTS:
+        raise click.BadParameter(f"choose from {', '.join(LAYOUTS)}", param_hint='--layout')
+    filters = {key: value for key, value in (('status', status), ('location', location), ('sublocation', sublocation),
+                                             ('category', category), ('subcategory', subcategory)) if value}
+    labels = label_rows(filters, list(asset_ids) or None)
+    if not labels:
+        raise click.ClickException('No assets match.')
+
+    started = time.perf_counter()
+    pool = get_pool()
+    with open(output, 'wb') as file:
+        for chunk in iter_label_sheets(labels, fmt, pool.executor, layout, dpi or current_app.config['LABEL_DPI'],
+                                       sheets_in_flight(current_app, pool)):
+            file.write(chunk)
+    per_sheet = LAYOUTS[layout].columns * LAYOUTS[layout].rows
+    click.echo(f"Wrote {len(labels)} labels on {-(-len(labels) // per_sheet)} sheets to {output} "
+               f"in {time.perf_counter() - started:.1f}s")
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Check that the list/filter queries are served by indexes (exits 1 on a full scan or a sort)."""
+    from .devtools.query_plans import check_query_plans
+    sys.exit(1 if check_query_plans() else 0)
+
+
+@click.command('generate-data')
+@click.option('--scale', type=click.Choice(['10k', '100k', '1m']), default='10k', show_default=True,
+              help='number of assets')
+@click.option('--assets', type=int, help='exact number of assets, overrides --scale')
+@click.option('--movement-rate', type=float, default=0.3, show_default=True,
+              help='share of assets that have been moved')
+@click.option('--maintenance-rate', type=float, default=0.25, show_default=True,
+              help='share of assets with maintenance history')
+@click.option('--seed', type=int, default=42, show_default=True, help='random seed, so runs are reproducible')
+@click.option('--batch-size', type=int, default=None, help='assets per INSERT and commit')
+@click.option('--reset', is_flag=True, help='drop and recreate every table first')
+@with_appcontext
+def generate_data_command(scale, assets, movement_rate, maintenance_rate, seed, batch_size, reset):
+    """Build a realistic asset register on top of the CSV reference data, for benchmarking."""
+    from .depreciation import compute_snapshot
+    from .devtools.datagen import SCALES, generate
+    from .reference_loader import load_reference_data
+
+    count = assets or SCALES[scale]
+    if reset:
+        reset_database()
+    elif db.session.execute(select(Asset.id).limit(1)).first() is not None:
+        raise click.ClickException('The database already has assets; pass --reset to replace them.')
+    load_reference_data()
+
+    click.echo(f"Generating {count} assets...")
+    started = time.perf_counter()
+    try:
+        movements, maintenance = generate(count, movement_rate, maintenance_rate, seed,
+                                          batch_size or current_app.config['IMPORT_BATCH_SIZE'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    removed, added = compute_snapshot()
+    click.echo(f"Generated {count} assets, {movements} movements, {maintenance} maintenance records "
+               f"and a depreciation snapshot of {added} assets in {time.perf_counter() - started:.0f}s")
+
+
+@click.command('benchmark')
+@click.option('--iterations', type=int, default=20, show_default=True)
+@click.option('--warmup', type=int, default=2, show_default=True)
+@click.option('--only', multiple=True, help='benchmark only this route (repeatable)')
+@click.option('--output', type=click.Path(dir_okay=False), help='write results as JSON to this file')
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False),
+              help='JSON results of an earlier run to compare against')
+@click.option('--fail-over', type=float, default=None, metavar='PCT',
+              help='with --compare, exit 1 if any route p50 is more than PCT% slower')
+@with_appcontext
+def benchmark_command(iterations, warmup, only, output, compare, fail_over):
+    """Measure latency, query count and peak memory of the main routes. Writes to the database."""
+    from .devtools.benchmark import compare as compare_results, run_benchmark
+
+    app = current_app._get_current_object()
+    try:
+        results = run_benchmark(app, only, iterations, warmup)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if output:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+        click.echo(f"\nResults written to {output}")
+    if compare:
+        with open(compare) as file:
+            regressions = compare_results(results, json.load(file), fail_over)
+        if regressions:
+            click.echo(f"\nSlower than {fail_over}% on: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+@click.command('load-test')
+@click.option('--profile', 'profiles', multiple=True, type=click.Choice(['development', 'production']),
+              help='configuration profile to test (repeatable, default: both)')
+@click.option('--duration', type=float, default=10, show_default=True, help='seconds of load per profile')
+@click.option('--readers', type=int, default=4, show_default=True)
+@click.option('--writers', type=int, default=2, show_default=True)
+@click.option('--assets', type=int, default=20000, show_default=True, help='assets seeded before the run')
+@click.option('--workdir', type=click.Path(file_okay=False), default=None,
+              help='directory for the scratch databases')
+def load_test_command(profiles, duration, readers, writers, assets, workdir):
+    """Measure read latency on the asset list and detail pages while other processes register assets."""
+    from .devtools.load_test import COLUMNS, run
+
+    workdir = workdir or tempfile.mkdtemp(prefix='asset-load-test-')
+    click.echo(' '.join(f'{column:>12}' for column in COLUMNS))
+    for profile in profiles or ('development', 'production'):
+        result = run(profile, workdir, duration, readers, writers, assets)
+        click.echo(' '.join(f'{result[c]:>12.1f}' if isinstance(result[c], float) else f'{result[c]:>12}'
+                            for c in COLUMNS))
+
+
+COMMANDS = (
+    init_db_command, upgrade_db_command, load_data_command, import_assets_command, compute_depreciation_command,
+    rebuild_search_command, reconcile_rollups_command, sync_maintenance_command, print_labels_command,
+    check_query_plans_command, generate_data_command, benchmark_command, load_test_command,
+)
+
+
+def init_app(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
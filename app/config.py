@@ -0,0 +1,97 @@
+"""Configuration profiles, selected with the ASSET_MANAGER_ENV environment variable.
+
+``development`` (the default) keeps the original single-process setup.
+``production`` is meant for several gunicorn workers sharing one SQLite
+file: WAL journaling lets readers proceed while a writer commits, and the
+busy timeout makes writers queue instead of failing with "database is
+locked". Set DATABASE_URL to point either profile at another database, such
+as a PostgreSQL URI; the SQLite pragmas are only applied to SQLite
+connections.
+"""
+import os
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///asset_manager.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key_here')
+
+    # Run db.create_all() in create_app(); otherwise use `flask init-db`
+    AUTO_CREATE_SCHEMA = True
+    # PRAGMA name -> value, run on every new SQLite connection
+    SQLITE_PRAGMAS = {}
+
+    # Request/SQL metrics served at /metrics (see metrics.py). Requests slower
+    # than SLOW_REQUEST_MS are logged with their SQL; unset disables the log.
+    METRICS_ENABLED = True
+    SLOW_REQUEST_MS = int(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None
+
+    ASSETS_PER_PAGE = 50
+    MAX_ASSETS_PER_PAGE = 500
+    IMPORT_BATCH_SIZE = 1000
+    EXPORT_BATCH_SIZE = 1000
+    BULK_MOVE_MAX_ASSETS = 10000
+    STOCKTAKE_MAX_SERIALS = 50000
+    # Entries per /changes page when no limit is given, and the largest limit allowed
+    CHANGES_PER_PAGE = 500
+    MAX_CHANGES_PER_PAGE = 5000
+    SEARCH_RESULTS_PER_PAGE = 50
+    # Open-ended maintenance older than this is reported as overdue
+    MAINTENANCE_OVERDUE_DAYS = 30
+    # Open-ended jobs per calendar response (the oldest first)
+    MAINTENANCE_OPEN_ENDED_PER_PAGE = 200
+    # Browser cache lifetime of the sublocation/subcategory lists; after it
+    # they are revalidated against the reference data version (ETag)
+    REFDATA_HTTP_MAX_AGE = 60
+
+    # Processes drawing label sheets (see barcodes.py); None uses every core
+    BARCODE_WORKERS = None
+    # In-memory LRU behind /barcode/<serial>.<png|svg> and its browser cache lifetime
+    BARCODE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    BARCODE_HTTP_MAX_AGE = 365 * 24 * 3600
+
+    # Label sheets (see labels.py): stock layout, print resolution, largest job,
+    # and sheets rendering at once (None: two per pool process)
+    LABEL_LAYOUT = 'a4-21'
+    LABEL_DPI = 300
+    LABEL_MAX_ASSETS = 20000
+    LABEL_SHEETS_IN_FLIGHT = None
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    AUTO_CREATE_SCHEMA = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000)),
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are KiB: 64 MiB of page cache per connection
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
+
+
+def get_config(name=None):
+    name = name or os.environ.get('ASSET_MANAGER_ENV', 'development')
+    try:
+        return CONFIGS[name]
+    except KeyError:
+        raise RuntimeError(f"Unknown ASSET_MANAGER_ENV '{name}', expected one of: {', '.join(CONFIGS)}")
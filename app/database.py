@@ -0,0 +1,33 @@
+from itertools import islice
+
+from sqlalchemy import event
+
+# Keep IN lists well under SQLite's bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+
+def batched(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def configure_engine(engine, config):
+    """Apply the configured SQLite pragmas to every new connection of ``engine``."""
+    pragmas = config['SQLITE_PRAGMAS']
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    # Connections opened before the listener existed miss the pragmas
+    engine.dispose()
@@ -0,0 +1,99 @@
+"""Straight-line depreciation computed in SQL and stored as dated snapshots.
+
+``Asset.depreciation`` is the annual rate in percent. As of a given date, the
+accumulated depreciation is ``cost * rate / 100 * age_in_years``, capped at
+the cost, and the book value is what remains. Both are SQL expressions over
+the asset columns, so a snapshot is a single INSERT ... SELECT, not a Python
+loop over ORM objects. Reports read the stored rows.
+"""
+from datetime import date
+
+from sqlalchemy import and_, case, delete, exists, func, insert, literal, select
+
+from .models import db, Asset, DepreciationSnapshot
+
+DAYS_PER_YEAR = 365.25
+
+
+def _age_in_days(as_of):
+    if db.engine.dialect.name == 'sqlite':
+        return func.julianday(literal(as_of.isoformat())) - func.julianday(Asset.purchased_on)
+    # PostgreSQL: date - date is a whole number of days
+    return literal(as_of) - Asset.purchased_on
+
+
+def depreciation_columns(as_of):
+    """Return (accumulated_depreciation, book_value) SQL expressions as of ``as_of``."""
+    age = _age_in_days(as_of)
+    years = case((age > 0, age), else_=0) / DAYS_PER_YEAR
+    straight_line = Asset.purchase_cost * Asset.depreciation / 100.0 * years
+    accumulated = case((straight_line > Asset.purchase_cost, Asset.purchase_cost), else_=straight_line)
+    return accumulated, Asset.purchase_cost - accumulated
+
+
+def compute_snapshot(as_of=None):
+    """Bring the snapshot for ``as_of`` up to date; returns (rows removed, rows added).
+
+    Rows whose copied inputs still match the asset are left alone. Only
+    assets that changed, appeared or were disposed since the snapshot was
+    last computed are deleted and recomputed.
+    """
+    as_of = as_of or date.today()
+    snapshot = DepreciationSnapshot.__table__
+    asset = Asset.__table__
+
+    unchanged = exists().where(
+        asset.c.id == snapshot.c.asset_id,
+        asset.c.status != 'Disposed',
+        asset.c.category_id == snapshot.c.category_id,
+        asset.c.location_id == snapshot.c.location_id,
+        asset.c.purchase_cost == snapshot.c.purchase_cost,
+        asset.c.depreciation == snapshot.c.depreciation_rate,
+        asset.c.purchased_on == snapshot.c.purchased_on,
+    )
+    removed = db.session.execute(
+        delete(snapshot).where(snapshot.c.snapshot_date == as_of, ~unchanged)
+    ).rowcount
+
+    accumulated, book_value = depreciation_columns(as_of)
+    missing = select(
+        literal(as_of), Asset.id, Asset.category_id, Asset.location_id, Asset.purchase_cost,
+        Asset.depreciation, Asset.purchased_on, accumulated, book_value,
+    ).where(
+        Asset.status != 'Disposed',
+        ~exists().where(and_(snapshot.c.snapshot_date == as_of, snapshot.c.asset_id == Asset.id)),
+    )
+    added = db.session.execute(
+        insert(snapshot).from_select(
+            ['snapshot_date', 'asset_id', 'category_id', 'location_id', 'purchase_cost',
+             'depreciation_rate', 'purchased_on', 'accumulated_depreciation', 'book_value'],
+            missing,
+        )
+    ).rowcount
+    db.session.commit()
+    return removed, added
+
+
+def snapshot_dates():
+    return db.session.execute(
+        select(DepreciationSnapshot.snapshot_date).distinct().order_by(DepreciationSnapshot.snapshot_date.desc())
+    ).scalars().all()
+
+
+def snapshot_totals(as_of, group_by=None):
+    """Sum cost, accumulated depreciation and book value for one snapshot date.
+
+    ``group_by`` is ``'category_id'``, ``'location_id'`` or ``None`` for the
+    grand total.
+    """
+    columns = [
+        func.count().label('assets'),
+        func.coalesce(func.sum(DepreciationSnapshot.purchase_cost), 0).label('purchase_cost'),
+        func.coalesce(func.sum(DepreciationSnapshot.accumulated_depreciation), 0).label('accumulated_depreciation'),
+        func.coalesce(func.sum(DepreciationSnapshot.book_value), 0).label('book_value'),
+    ]
+    stmt = select(*columns).where(DepreciationSnapshot.snapshot_date == as_of)
+    if group_by is None:
+        return db.session.execute(stmt).one()
+    key = getattr(DepreciationSnapshot, group_by)
+    return db.session.execute(stmt.add_columns(key.label('key')).group_by(key).order_by(key)).all()
@@ -0,0 +1,5 @@
+"""Benchmarking and diagnostic tools behind the ``flask`` development commands.
+
+Nothing here is imported by the web app; each command imports its module
+when it runs.
+"""
@@ -0,0 +1,212 @@
+"""Latency, SQL statement count and peak memory of the main routes.
+
+Each scenario builds one request against the data in the database (use a
+register from ``datagen``) and is sent through the Flask test client:
+warm-up requests first, then timed iterations, then one more under
+``tracemalloc`` for the peak allocation, which would distort the timings.
+Write scenarios change the database, so never point this at a live register.
+"""
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import sqlalchemy
+from sqlalchemy import event, func, select
+
+from ..models import db, Asset, AssetMovement
+from ..refdata import get_reference_data
+
+
+class Scenarios:
+    """Builds the request for each iteration of each benchmarked route from the data present."""
+
+    def __init__(self):
+        ref = get_reference_data()
+        self.ref = ref
+        self.asset_count = db.session.execute(select(func.count()).select_from(Asset)).scalar()
+        if not self.asset_count:
+            raise ValueError('The database has no assets; run flask generate-data first.')
+        max_id = db.session.execute(select(func.max(Asset.id))).scalar()
+        # Spread the sample over the whole id range so caches do not flatter the numbers
+        step = max(1, max_id // 200)
+        self.asset_ids = db.session.execute(
+            select(Asset.id).where(Asset.id % step == 0).limit(200)).scalars().all()
+        busiest = db.session.execute(
+            select(Asset.location_id, func.count()).group_by(Asset.location_id).order_by(func.count().desc()).limit(2)
+        ).all()
+        self.location_id = busiest[0][0]
+        self.other_location_id = busiest[-1][0]
+        self.sample = db.session.get(Asset, self.asset_ids[0])
+        moved = db.session.execute(select(AssetMovement.asset_id).limit(1)).scalar()
+        self.moved_asset_id = moved or self.asset_ids[0]
+        self.mid_id = max_id // 2
+        self.serial_prefix = self.sample.serial_number.rsplit('-', 2)[0] + '-'
+        self.word = self.sample.type.split()[0]
+        self._iteration = 0
+        self._bulk_round = 0
+
+    def _next_asset_id(self):
+        self._iteration += 1
+        return self.asset_ids[self._iteration % len(self.asset_ids)]
+
+    def _sublocation_of(self, location_id):
+        return next(sublocation.id for sublocation in self.ref.sublocations if sublocation.location_id == location_id)
+
+    def register(self):
+        category = self.ref.category_by_id[self.sample.category_id]
+        return 'POST', '/register', {'data': {
+            'name': 'Benchmark asset', 'type': 'Benchmark', 'category': category.id,
+            'subcategory': self.sample.subcategory_id, 'location': self.sample.location_id,
+            'sublocation': self.sample.sublocation_id, 'status': 'Active', 'depreciation': '10',
+            'purchase_cost': '100', 'purchased_on': date.today().isoformat(),
+        }}
+
+    def move(self):
+        asset = db.session.get(Asset, self._next_asset_id())
+        # Alternate between the two busiest locations so every move rewrites the serial
+        target = self.other_location_id if asset.location_id == self.location_id else self.location_id
+        return 'POST', f'/move_asset/{asset.id}', {'data': {
+            'new_location': target, 'new_sublocation': self._sublocation_of(target)}}
+
+    def bulk_move(self):
+        # The same 50 assets go back and forth between the two busiest locations
+        self._bulk_round += 1
+        target = self.location_id if self._bulk_round % 2 else self.other_location_id
+        return 'POST', '/api/assets/bulk_move', {'json': {
+            'asset_ids': self.asset_ids[:50], 'location_id': target,
+            'sublocation_id': self._sublocation_of(target)}}
+
+    def all(self):
+        asset_url = lambda: f'/assets/{self._next_asset_id()}'
+        return {
+            'dashboard': lambda: ('GET', '/', {}),
+            'list_assets': lambda: ('GET', '/assets', {}),
+            'list_assets_filtered': lambda: ('GET', f'/assets?status=Active&location={self.location_id}', {}),
+            'list_assets_deep_page': lambda: ('GET', f'/assets?after={self.mid_id}', {}),
+            'asset_detail': lambda: ('GET', asset_url(), {}),
+            'search_words': lambda: ('GET', f'/assets/search?q={self.word}', {}),
+            'search_serial_prefix': lambda: ('GET', f'/assets/search?q={self.serial_prefix}', {}),
+            'register_asset': self.register,
+            'move_asset': self.move,
+            'bulk_move_50': self.bulk_move,
+            'depreciation_summary': lambda: ('GET', '/depreciation_summary', {}),
+            'export_csv_location': lambda: ('GET', f'/assets/export.csv?location={self.other_location_id}', {}),
+            'maintenance_calendar': lambda: ('GET', '/api/maintenance/calendar', {}),
+            'location_occupancy_as_of': lambda: (
+                'GET', f'/api/locations/{self.location_id}/assets?as_of={date.today().replace(day=1).isoformat()}', {}),
+            'asset_location_as_of': lambda: (
+                'GET', f'/api/assets/{self.moved_asset_id}/location?as_of=2020-01-01', {}),
+        }
+
+
+def run_once(client, request):
+    method, url, kwargs = request
+    response = client.open(url, method=method, **kwargs)
+    # Drain streamed bodies so their queries and memory are counted
+    response.get_data()
+    return response.status_code
+
+
+def benchmark(client, name, build, iterations, warmup, query_counter):
+    for _ in range(warmup):
+        run_once(client, build())
+
+    latencies, queries, statuses = [], [], set()
+    for _ in range(iterations):
+        request = build()
+        query_counter[0] = 0
+        started = time.perf_counter()
+        statuses.add(run_once(client, request))
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(query_counter[0])
+
+    # Peak memory from a separate pass: tracing slows everything down
+    request = build()
+    tracemalloc.start()
+    run_once(client, request)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        'min_ms': round(latencies[0], 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries': max(queries),
+        'peak_kib': round(peak / 1024, 1),
+        'status': sorted(statuses),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print p50/query/memory changes against ``baseline``; returns the routes slower than ``threshold`` %."""
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta'].get('timestamp')}):")
+    print(f"{'route':28} {'p50 ms':>10} {'change':>8} {'queries':>9} {'peak KiB':>10}")
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:28} {result['p50_ms']:>10.2f} {'new':>8}")
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        queries = f"{before['queries']}->{result['queries']}" if before['queries'] != result['queries'] else str(result['queries'])
+        print(f"{name:28} {result['p50_ms']:>10.2f} {change:>+7.1f}% {queries:>9} {result['peak_kib']:>10.1f}")
+        if threshold is not None and change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def run_benchmark(app, names=None, iterations=20, warmup=2):
+    """Benchmark the named scenarios (all by default) and return the results with run metadata."""
+    query_counter = [0]
+
+    def count_query(*_):
+        query_counter[0] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        scenarios = Scenarios()
+        selected = scenarios.all()
+        if names:
+            unknown = set(names) - set(selected)
+            if unknown:
+                raise ValueError(f"Unknown route(s): {', '.join(sorted(unknown))}; choose from {', '.join(selected)}")
+            selected = {name: build for name, build in selected.items() if name in names}
+
+        output = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlalchemy': sqlalchemy.__version__,
+                'database': db.engine.dialect.name,
+                'assets': scenarios.asset_count,
+                'iterations': iterations,
+            },
+            'results': {},
+        }
+        client = app.test_client()
+        print(f"{'route':28} {'p50 ms':>10} {'p95 ms':>10} {'queries':>8} {'peak KiB':>10}")
+        for name, build in selected.items():
+            result = benchmark(client, name, build, iterations, warmup, query_counter)
+            output['results'][name] = result
+            print(f"{name:28} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['queries']:>8} "
+                  f"{result['peak_kib']:>10.1f}")
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+    return output
@@ -0,0 +1,179 @@
+"""Synthetic asset registers for benchmarking.
+
+``generate`` builds a seeded register on top of the loaded reference data: a
+few locations and categories hold most of the assets, some assets have
+movement history and maintenance windows, and assets under repair have an
+open job. The same seed always produces the same data.
+"""
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select
+
+from ..database import IN_CHUNK_SIZE, batched
+from ..importer import bulk_insert
+from ..models import db, Asset, AssetMovement, Maintenance, SerialSequence
+from ..refdata import get_reference_data
+from ..serials import format_serial
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+STATUS_WEIGHTS = {'Active': 85, 'Under Repair': 4, 'Disposed': 11}
+FIRST_NAMES = ('Aisha', 'Ben', 'Chen', 'Diego', 'Elena', 'Farah', 'George', 'Hiro', 'Ines', 'Jamal',
+               'Kavya', 'Liam', 'Maria', 'Noah', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq')
+LAST_NAMES = ('Ahmed', 'Brown', 'Costa', 'Dubois', 'Evans', 'Fischer', 'Garcia', 'Hassan', 'Ito', 'Khan',
+              'Lee', 'Mensah', 'Nair', 'Okafor', 'Patel', 'Rossi', 'Silva', 'Tanaka', 'Usman', 'Wong')
+MAINTENANCE_TYPES = {
+    'Preventive': ('Routine inspection and cleaning', 'Filter replacement', 'Firmware update', 'Calibration check'),
+    'Repair': ('Replaced faulty power supply', 'Fixed cracked hinge', 'Motor bearing replaced', 'Screen replaced'),
+    'Inspection': ('Annual safety inspection', 'Electrical test and tag', 'Warranty inspection'),
+}
+
+
+def _weighted(items, rng, skew=1.1):
+    # Zipf-like weights so a few locations and categories hold most assets,
+    # as in a real register
+    order = list(items)
+    rng.shuffle(order)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(order))]
+    return order, weights
+
+
+class Generator:
+    def __init__(self, seed, today):
+        self.rng = random.Random(seed)
+        self.today = today
+        ref = get_reference_data()
+        self.ref = ref
+
+        sublocations = defaultdict(list)
+        for sublocation in ref.sublocations:
+            sublocations[sublocation.location_id].append(sublocation)
+        subcategories = defaultdict(list)
+        for subcategory in ref.subcategories:
+            subcategories[subcategory.category_id].append(subcategory)
+        if not sublocations or not subcategories:
+            raise ValueError('Reference data has no sublocations or subcategories; run flask load-data first.')
+        self.sublocations = sublocations
+        self.subcategories = subcategories
+        self.locations, self.location_weights = _weighted(
+            [location for location in ref.locations if sublocations[location.id]], self.rng)
+        self.categories, self.category_weights = _weighted(
+            [category for category in ref.categories if subcategories[category.id]], self.rng)
+        self.suffixes = defaultdict(int)  # category id -> last suffix used, as SerialSequence keeps it
+
+    def place(self):
+        location = self.rng.choices(self.locations, self.location_weights)[0]
+        return location, self.rng.choice(self.sublocations[location.id])
+
+    def asset(self):
+        rng = self.rng
+        category = rng.choices(self.categories, self.category_weights)[0]
+        subcategory = rng.choice(self.subcategories[category.id])
+        location, sublocation = self.place()
+        self.suffixes[category.id] += 1
+        suffix = self.suffixes[category.id]
+        status = rng.choices(list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values()))[0]
+        return {
+            'name': f'{subcategory.name} {suffix:05d}',
+            'type': subcategory.name,
+            'category_id': category.id,
+            'subcategory_id': subcategory.id,
+            'location_id': location.id,
+            'sublocation_id': sublocation.id,
+            'status': status,
+            'assigned_to': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}' if rng.random() < 0.6 else None,
+            'depreciation': rng.choice((10.0, 12.5, 20.0, 25.0, 33.3)),
+            'purchased_on': self.today - timedelta(days=rng.randint(30, 8 * 365)),
+            'purchase_cost': round(rng.lognormvariate(6.5, 1.0), 2),
+            'serial_number': format_serial(location.code, category.code, sublocation.code, suffix),
+        }
+
+    def movements(self, asset, asset_id, count):
+        """``count`` moves between the purchase date and today, ending where the asset is now."""
+        rng = self.rng
+        span = (self.today - asset['purchased_on']).days
+        days = sorted(rng.sample(range(1, span), min(count, span - 1)))
+        category_code = self.ref.category_by_id[asset['category_id']].code
+        suffix = asset['serial_number'].rsplit('-', 1)[-1]
+
+        # Walk backwards from the current position
+        rows = []
+        location_id, sublocation_id, serial = asset['location_id'], asset['sublocation_id'], asset['serial_number']
+        for day in reversed(days):
+            previous_location, previous_sublocation = self.place()
+            previous_serial = (serial if previous_location.id == location_id else format_serial(
+                previous_location.code, category_code, previous_sublocation.code, suffix))
+            rows.append({
+                'asset_id': asset_id,
+                'from_location_id': previous_location.id, 'to_location_id': location_id,
+                'from_sublocation_id': previous_sublocation.id, 'to_sublocation_id': sublocation_id,
+                'old_serial': previous_serial, 'new_serial': serial,
+                'movement_date': asset['purchased_on'] + timedelta(days=day),
+            })
+            location_id, sublocation_id, serial = previous_location.id, previous_sublocation.id, previous_serial
+        return rows
+
+    def maintenance(self, asset, asset_id, count):
+        """``count`` closed, non-overlapping windows, plus an open one if the asset is under repair."""
+        rng = self.rng
+        rows = []
+        day = asset['purchased_on'] + timedelta(days=rng.randint(1, 90))
+        for _ in range(count):
+            if day >= self.today - timedelta(days=30):
+                break
+            maintenance_type = rng.choice(list(MAINTENANCE_TYPES))
+            end = min(day + timedelta(days=rng.randint(0, 14)), self.today - timedelta(days=20))
+            rows.append({'asset_id': asset_id, 'start_date': day, 'end_date': end, 'type': maintenance_type,
+                         'description': rng.choice(MAINTENANCE_TYPES[maintenance_type])})
+            day = end + timedelta(days=rng.randint(30, 400))
+        if asset['status'] == 'Under Repair':
+            start = max(self.today - timedelta(days=rng.randint(0, 60)), asset['purchased_on'],
+                        rows[-1]['end_date'] + timedelta(days=1) if rows else asset['purchased_on'])
+            rows.append({'asset_id': asset_id, 'start_date': start,
+                         'end_date': None, 'type': 'Repair', 'description': rng.choice(MAINTENANCE_TYPES['Repair'])})
+        return rows
+
+
+def generate(count, movement_rate, maintenance_rate, seed, batch_size):
+    generator = Generator(seed, date.today())
+    started = time.perf_counter()
+    movements = maintenance = 0
+
+    for batch_number, batch in enumerate(batched((generator.asset() for _ in range(count)), batch_size)):
+        bulk_insert(Asset, batch, batch_size)
+        ids = {}
+        for chunk in batched([asset['serial_number'] for asset in batch], IN_CHUNK_SIZE):
+            ids.update((serial, asset_id) for asset_id, serial in db.session.execute(
+                select(Asset.id, Asset.serial_number).where(Asset.serial_number.in_(chunk))))
+        movement_rows, maintenance_rows = [], []
+        rng = generator.rng
+        for asset in batch:
+            asset_id = ids[asset['serial_number']]
+            if rng.random() < movement_rate:
+                movement_rows.extend(generator.movements(asset, asset_id, rng.choice((1, 1, 1, 2, 2, 3, 5))))
+            if rng.random() < maintenance_rate or asset['status'] == 'Under Repair':
+                maintenance_rows.extend(generator.maintenance(asset, asset_id, rng.choice((0, 1, 1, 2, 3))))
+        # Generated history predates the change feed, which starts from the
+        # registered entries bulk_insert writes with each asset's current state
+        if movement_rows:
+            db.session.execute(insert(AssetMovement), movement_rows)
+        if maintenance_rows:
+            db.session.execute(insert(Maintenance), maintenance_rows)
+        db.session.commit()
+        movements += len(movement_rows)
+        maintenance += len(maintenance_rows)
+        done = min((batch_number + 1) * batch_size, count)
+        if done % (batch_size * 50) == 0 or done == count:
+            print(f"  {done} assets ({time.perf_counter() - started:.0f}s)")
+
+    # Later registrations continue after the generated suffixes
+    db.session.execute(SerialSequence.__table__.delete())
+    db.session.execute(insert(SerialSequence), [
+        {'category_id': category_id, 'last_value': last_value}
+        for category_id, last_value in generator.suffixes.items()
+    ])
+    db.session.commit()
+    return movements, maintenance
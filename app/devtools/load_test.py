@@ -0,0 +1,115 @@
+"""Read latency of the asset list and detail pages under concurrent registrations.
+
+Each profile gets its own scratch SQLite database. Reader and writer
+processes build their own app from the profile, so the numbers include the
+profile's engine pool and SQLite pragmas.
+"""
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import get_context
+
+from ..importer import bulk_insert
+from ..models import db, Asset, Location, SubLocation, Category, SubCategory
+
+COLUMNS = ('profile', 'reads', 'read_errors', 'read_p50_ms', 'read_p95_ms', 'read_p99_ms', 'read_max_ms',
+           'writes', 'write_errors')
+
+
+def load_app(database_url, profile):
+    from .. import create_app
+    return create_app(profile, SQLALCHEMY_DATABASE_URI=database_url)
+
+
+def seed(database_url, profile, assets):
+    app = load_app(database_url, profile)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        location = Location(name='Load Test', code='LT')
+        category = Category(name='Load Test', code='LT')
+        db.session.add_all([location, category])
+        db.session.flush()
+        db.session.add_all([
+            SubLocation(name='Load Test', code='LT', location_id=location.id),
+            SubCategory(name='Load Test', code='LT', category_id=category.id),
+        ])
+        db.session.commit()
+        bulk_insert(Asset, ({
+            'name': f'Asset {i}', 'type': 'Load', 'category_id': 1, 'subcategory_id': 1,
+            'location_id': 1, 'sublocation_id': 1, 'status': 'Active', 'depreciation': 10.0,
+            'purchased_on': date(2020, 1, 1), 'purchase_cost': 100.0, 'serial_number': f'SEED-{i:07d}',
+        } for i in range(1, assets + 1)))
+
+
+def reader(database_url, profile, start_at, stop_at, assets):
+    app = load_app(database_url, profile)
+    client = app.test_client()
+    latencies, errors = [], 0
+    time.sleep(max(0, start_at - time.time()))
+    while time.time() < stop_at:
+        if random.random() < 0.5:
+            url = f'/assets?per_page=50&after={random.randint(0, assets)}'
+        else:
+            url = f'/assets/{random.randint(1, assets)}'
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors += 1
+    return latencies, errors
+
+
+def writer(database_url, profile, start_at, stop_at):
+    app = load_app(database_url, profile)
+    client = app.test_client()
+    committed, failed = 0, 0
+    form = {'name': 'Load', 'type': 'Load', 'category': 1, 'subcategory': 1, 'location': 1, 'sublocation': 1,
+            'status': 'Active', 'depreciation': '10', 'purchase_cost': '100', 'purchased_on': '2024-01-01'}
+    time.sleep(max(0, start_at - time.time()))
+    while time.time() < stop_at:
+        # A successful registration redirects; errors re-render the form
+        if client.post('/register', data=form).status_code == 302:
+            committed += 1
+        else:
+            failed += 1
+    return committed, failed
+
+
+def run(profile, workdir, duration=10, readers=4, writers=2, assets=20000):
+    """Seed a scratch database for ``profile``, run the readers and writers, and return the summary."""
+    database_url = 'sqlite:///' + os.path.join(workdir, f'load_test_{profile}.db')
+    seed(database_url, profile, assets)
+
+    start_at = time.time() + 2
+    stop_at = start_at + duration
+    # spawn: each process builds its own app rather than inheriting the caller's
+    with ProcessPoolExecutor(max_workers=readers + writers, mp_context=get_context('spawn')) as pool:
+        reader_futures = [pool.submit(reader, database_url, profile, start_at, stop_at, assets)
+                          for _ in range(readers)]
+        writer_futures = [pool.submit(writer, database_url, profile, start_at, stop_at)
+                          for _ in range(writers)]
+        latencies, read_errors = [], 0
+        for future in reader_futures:
+            values, errors = future.result()
+            latencies.extend(values)
+            read_errors += errors
+        committed = sum(future.result()[0] for future in writer_futures)
+        write_errors = sum(future.result()[1] for future in writer_futures)
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0
+    return {
+        'profile': profile,
+        'reads': len(latencies),
+        'read_errors': read_errors,
+        'read_p50_ms': statistics.median(latencies) if latencies else 0,
+        'read_p95_ms': percentile(0.95),
+        'read_p99_ms': percentile(0.99),
+        'read_max_ms': latencies[-1] if latencies else 0,
+        'writes': committed,
+        'write_errors': write_errors,
+    }
@@ -0,0 +1,90 @@
+"""Checks that the hot list, filter, history and calendar queries use indexes.
+
+Plans come from SQLite's EXPLAIN QUERY PLAN, by default against a fresh
+in-memory schema built from the models, so the result does not depend on the
+local database.
+"""
+import itertools
+from datetime import date
+
+from sqlalchemy import create_engine, select
+
+from ..models import db, Asset, AssetChange, AssetMovement, Maintenance
+from ..maintenance import calendar_statements, open_ended_statement
+from ..movements import occupancy_statements
+from ..queries import ASSET_FILTERS, filter_assets, with_reference_data
+
+
+SAMPLE_VALUES = {
+    'status': 'Active',
+    'location': 1,
+    'sublocation': 1,
+    'category': 1,
+    'subcategory': 1,
+}
+
+
+def hot_queries():
+    """Yield (label, query) for every query that must be served by an index."""
+    # list_assets: every combination of filters, first page and a later page
+    for size in range(1, len(ASSET_FILTERS) + 1):
+        for keys in itertools.combinations(ASSET_FILTERS, size):
+            filters = {key: SAMPLE_VALUES[key] for key in keys}
+            query = with_reference_data(filter_assets(Asset.query, filters))
+            label = 'list_assets[' + ','.join(keys) + ']'
+            yield label, query.order_by(Asset.id).limit(51)
+            yield label + ' after', query.filter(Asset.id > 100).order_by(Asset.id).limit(51)
+
+    yield 'serial sequence seed', select(Asset.serial_number).where(Asset.category_id == 1)
+    yield 'maintenance_history', Maintenance.query.filter_by(asset_id=1)
+
+    as_of = date(2024, 1, 31)
+    yield 'asset timeline', select(AssetMovement).where(AssetMovement.asset_id == 1).order_by(
+        AssetMovement.movement_date, AssetMovement.id)
+    for sublocation_id in (None, 1):
+        stayed, left = occupancy_statements(1, as_of, sublocation_id)
+        yield f'occupancy stayed[sublocation={sublocation_id}]', stayed
+        yield f'occupancy left[sublocation={sublocation_id}]', left
+    for location_id in (None, 1):
+        for i, stmt in enumerate(calendar_statements(as_of, date(2024, 2, 29), location_id)):
+            yield f'maintenance calendar part {i + 1}[location={location_id}]', stmt
+        yield f'open-ended maintenance[location={location_id}]', open_ended_statement(
+            date(2024, 2, 29), location_id).offset(200).limit(201)
+    yield 'maintenance_history ordered', Maintenance.query.filter_by(asset_id=1).order_by(
+        Maintenance.start_date.desc(), Maintenance.id.desc())
+    yield 'scan by old serial', select(AssetMovement.old_serial, AssetMovement.asset_id).where(
+        AssetMovement.old_serial.in_(['A-B-C-001', 'A-B-C-002']), AssetMovement.old_serial != AssetMovement.new_serial)
+    yield 'stock-take expected', select(Asset.id, Asset.serial_number).where(
+        Asset.sublocation_id == 1, Asset.status != 'Disposed')
+    yield 'change feed', select(AssetChange).where(AssetChange.seq > 100).order_by(AssetChange.seq).limit(501)
+    yield 'movements into location', select(AssetMovement).where(
+        AssetMovement.to_location_id == 1, AssetMovement.movement_date.between(as_of, date(2024, 2, 29)))
+
+
+def full_scans(engine, query):
+    statement = getattr(query, 'statement', query)  # ORM Query or Core select()
+    sql = str(statement.compile(engine, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    # Each row is (id, parent, notused, detail); "SCAN t" without a search
+    # constraint means the whole table (or a whole index) is read, and a temp
+    # B-tree for ORDER BY means every match is read and sorted before LIMIT
+    return [row[3] for row in plan if row[3].startswith('SCAN ') or row[3] == 'USE TEMP B-TREE FOR ORDER BY']
+
+
+def check_query_plans(engine=None):
+    # By default plans are checked against a fresh schema built from the
+    # models, so the result does not depend on whatever indexes the local
+    # database has; the tests pass a seeded database instead
+    if engine is None:
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+
+    failures = 0
+    for label, query in hot_queries():
+        scans = full_scans(engine, query)
+        if scans:
+            failures += 1
+            print(f"FAIL {label}: {'; '.join(scans)}")
+    print(f"Checked query plans: {failures} full scan(s) or sort(s) found")
+    return failures
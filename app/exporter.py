@@ -0,0 +1,77 @@
+"""Streaming export of the asset register.
+
+Rows are read with ``yield_per`` so the driver hands them over in fixed-size
+partitions, and every partition is encoded and yielded before the next one is
+fetched. Memory stays flat however many assets match, and the client
+receives the header before the query has finished.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from .models import db, Asset, Location, SubLocation, Category, SubCategory
+from .queries import filter_assets
+
+EXPORT_COLUMNS = (
+    Asset.id,
+    Asset.serial_number,
+    Asset.name,
+    Asset.type,
+    Asset.status,
+    Asset.assigned_to,
+    Asset.depreciation,
+    Asset.purchased_on,
+    Asset.purchase_cost,
+    Category.code.label('category_code'),
+    Category.name.label('category'),
+    SubCategory.code.label('subcategory_code'),
+    SubCategory.name.label('subcategory'),
+    Location.code.label('location_code'),
+    Location.name.label('location'),
+    SubLocation.code.label('sublocation_code'),
+    SubLocation.name.label('sublocation'),
+)
+
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_statement(filters):
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .join(Category, Asset.category_id == Category.id)
+        .join(SubCategory, Asset.subcategory_id == SubCategory.id)
+        .join(Location, Asset.location_id == Location.id)
+        .join(SubLocation, Asset.sublocation_id == SubLocation.id)
+    )
+    return filter_assets(stmt, filters).order_by(Asset.id)
+
+
+def _partitions(filters, batch_size):
+    result = db.session.execute(export_statement(filters).execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def iter_csv(filters, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in EXPORT_COLUMNS])
+    yield buffer.getvalue()
+    for rows in _partitions(filters, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(filters, batch_size):
+    keys = [column.key for column in EXPORT_COLUMNS]
+    for rows in _partitions(filters, batch_size):
+        yield ''.join(json.dumps(dict(zip(keys, row)), default=str) + '\n' for row in rows)
+
+
+EXPORTERS = {'csv': iter_csv, 'ndjson': iter_ndjson}
@@ -0,0 +1,219 @@
+"""Streaming CSV import of assets and batched inserts.
+
+Rows are read one at a time and resolved against the cached reference maps, so
+the file is never held in memory and no row costs a lookup query. Valid rows
+are inserted ``batch_size`` at a time with one executemany INSERT per batch,
+one serial-suffix reservation per category in the batch, and a commit per
+batch. Bad rows are reported and skipped; the rest of the file
+still loads, including lines that are not UTF-8. A file whose CSV
+structure breaks is reported at the line where reading stopped, after
+importing the rows before it.
+"""
+import csv
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from .changes import record_changes, registered_entries
+from .database import batched
+from .models import db, ASSET_STATUSES, Asset
+from .refdata import REFERENCE_MODELS, bump_version, get_reference_data
+from .rollups import apply_deltas, rollup_key
+from .serials import allocate_serial_suffixes, format_serial
+
+DEFAULT_BATCH_SIZE = 1000
+
+ASSET_CSV_COLUMNS = ('name', 'type', 'category_code', 'subcategory_code', 'location_code',
+                     'sublocation_code', 'status', 'depreciation', 'purchased_on')
+OPTIONAL_ASSET_CSV_COLUMNS = ('assigned_to', 'purchase_cost')
+
+
+def _insert_assets(rows):
+    # The change feed needs the new ids; RETURNING hands them back in row order
+    return db.session.execute(insert(Asset).returning(Asset.id, sort_by_parameter_order=True), rows).scalars().all()
+
+
+def bulk_insert(model, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert an iterable of column dicts in executemany batches, committing each one."""
+    count = 0
+    for batch in batched(rows, batch_size):
+        if model is Asset:
+            asset_ids = _insert_assets(batch)
+        else:
+            db.session.execute(insert(model), batch)
+        # Bulk statements skip the flush hooks that normally do this
+        if model in REFERENCE_MODELS:
+            bump_version(db.session.connection())
+        elif model is Asset:
+            apply_deltas(db.session.connection(), Counter(rollup_key(row) for row in batch))
+            record_changes(db.session.connection(), registered_entries(asset_ids, batch))
+        db.session.commit()
+        count += len(batch)
+    return count
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []  # (line number, message)
+
+    def error(self, line_no, message):
+        self.errors.append((line_no, message))
+
+
+def _parse_asset_row(row, ref):
+    def required(column):
+        value = (row.get(column) or '').strip()
+        if not value:
+            raise ValueError(f"missing {column}")
+        return value
+
+    location_code = required('location_code')
+    location_id = ref.location_id_by_code.get(location_code)
+    if location_id is None:
+        raise ValueError(f"unknown location code '{location_code}'")
+    sublocation_code = required('sublocation_code')
+    sublocation_id = ref.sublocation_id_by_code.get((location_id, sublocation_code))
+    if sublocation_id is None:
+        raise ValueError(f"unknown sublocation code '{sublocation_code}' in location '{location_code}'")
+
+    category_code = required('category_code')
+    category_id = ref.category_id_by_code.get(category_code)
+    if category_id is None:
+        raise ValueError(f"unknown category code '{category_code}'")
+    subcategory_code = required('subcategory_code')
+    subcategory_id = ref.subcategory_id_by_code.get((category_id, subcategory_code))
+    if subcategory_id is None:
+        raise ValueError(f"unknown subcategory code '{subcategory_code}' in category '{category_code}'")
+
+    status = required('status')
+    if status not in ASSET_STATUSES:
+        raise ValueError(f"invalid status '{status}'")
+    try:
+        depreciation = float(required('depreciation'))
+    except ValueError:
+        raise ValueError(f"invalid depreciation '{row.get('depreciation')}'")
+    try:
+        purchase_cost = float((row.get('purchase_cost') or '').strip() or 0)
+    except ValueError:
+        raise ValueError(f"invalid purchase_cost '{row.get('purchase_cost')}'")
+    try:
+        purchased_on = date.fromisoformat(required('purchased_on'))
+    except ValueError:
+        raise ValueError(f"invalid purchased_on '{row.get('purchased_on')}' (expected YYYY-MM-DD)")
+
+    return {
+        'name': required('name'),
+        'type': required('type'),
+        'category_id': category_id,
+        'subcategory_id': subcategory_id,
+        'location_id': location_id,
+        'sublocation_id': sublocation_id,
+        'status': status,
+        'assigned_to': (row.get('assigned_to') or '').strip() or None,
+        'depreciation': depreciation,
+        'purchased_on': purchased_on,
+        'purchase_cost': purchase_cost,
+    }
+
+
+def _assign_serials(rows, ref):
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['category_id'], []).append(row)
+    for category_id, group in groups.items():
+        first = allocate_serial_suffixes(category_id, count=len(group))
+        for offset, row in enumerate(group):
+            row['serial_number'] = format_serial(
+                ref.location_by_id[row['location_id']].code,
+                ref.category_by_id[category_id].code,
+                ref.sublocation_by_id[row['sublocation_id']].code,
+                first + offset,
+            )
+
+
+def _insert_rows(rows):
+    asset_ids = _insert_assets(rows)
+    apply_deltas(db.session.connection(), Counter(rollup_key(row) for row in rows))
+    record_changes(db.session.connection(), registered_entries(asset_ids, rows))
+
+
+def _insert_asset_batch(batch, ref, report):
+    rows = [row for _, row in batch]
+    try:
+        _assign_serials(rows, ref)
+        _insert_rows(rows)
+        db.session.commit()
+        report.inserted += len(rows)
+        return
+    except IntegrityError:
+        db.session.rollback()
+
+    # Some row broke a constraint; retry row by row so only that row is
+    # rejected. The rollback also returned the suffixes, so draw them again.
+    for line_no, row in batch:
+        try:
+            with db.session.begin_nested():
+                _assign_serials([row], ref)
+                _insert_rows([row])
+        except IntegrityError as e:
+            report.error(line_no, f"could not insert: {e.orig}")
+            continue
+        report.inserted += 1
+    db.session.commit()
+
+
+def _decoded(lines, report):
+    # Lines are decoded one at a time, so a line that is not UTF-8 is a row
+    # error like any other. It is replaced by a blank line, which the reader
+    # skips, so later line numbers stay right.
+    for line_no, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8-sig' if line_no == 1 else 'utf-8')
+            except UnicodeDecodeError as e:
+                report.error(line_no, f"not UTF-8 text ({e.reason})")
+                line = '\n'
+        yield line
+
+
+def _read_rows(reader, report):
+    # A broken quote or an oversized field leaves the rest of the file
+    # unparseable; the rows before it are still imported
+    try:
+        yield from reader
+    except csv.Error as e:
+        report.error(reader.line_num, f"stopped reading: not valid CSV ({e})")
+
+
+def import_assets(lines, batch_size=DEFAULT_BATCH_SIZE):
+    """Import assets from an iterable of CSV lines, as bytes (UTF-8) or text."""
+    report = ImportReport()
+    reader = csv.DictReader(_decoded(lines, report))
+    try:
+        fieldnames = reader.fieldnames or ()
+    except csv.Error as e:
+        report.error(1, f"cannot read the file: not valid CSV ({e})")
+        return report
+    if report.errors:
+        return report  # the header line is not UTF-8
+    missing = [column for column in ASSET_CSV_COLUMNS if column not in fieldnames]
+    if missing:
+        report.error(1, f"missing columns: {', '.join(missing)}")
+        return report
+
+    ref = get_reference_data()
+    batch = []
+    for row in _read_rows(reader, report):
+        try:
+            batch.append((reader.line_num, _parse_asset_row(row, ref)))
+        except ValueError as e:
+            report.error(reader.line_num, str(e))
+        if len(batch) >= batch_size:
+            _insert_asset_batch(batch, ref, report)
+            batch = []
+    if batch:
+        _insert_asset_batch(batch, ref, report)
+    return report
@@ -0,0 +1,149 @@
+"""Printable sheets of asset labels.
+
+A sheet is one page of a label stock layout, such as A4 with 3 x 7 labels.
+Each label carries the asset name, a Code 128 barcode and the serial. Whole
+sheets are drawn in the barcode process pool (see ``sheets``), several at a
+time, and are written out in order as each one finishes. Only the sheets in
+flight are ever held in memory, however many labels the job has.
+
+Sheets are drawn 1-bit at ``LABEL_DPI``: the bars stay sharp and a page
+compresses to a few tens of KiB. The PDF is written by hand, one page at a
+time, because PDF libraries build the whole document before writing it. The
+PNG sheets are stored in a ZIP, one entry per sheet.
+"""
+import io
+import zipfile
+from collections import deque
+
+from sqlalchemy import select
+
+from .database import batched
+from .models import db, Asset
+from .queries import filter_assets
+from .sheets import LAYOUTS, render_sheet
+
+SHEET_MIMETYPES = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+
+
+def label_rows(filters=None, asset_ids=None, limit=None):
+    """``(serial, name)`` for the assets to print, in id order."""
+    stmt = select(Asset.serial_number, Asset.name)
+    if asset_ids is not None:
+        stmt = stmt.where(Asset.id.in_(asset_ids))
+    else:
+        stmt = filter_assets(stmt, filters or {})
+    return [tuple(row) for row in db.session.execute(stmt.order_by(Asset.id).limit(limit))]
+
+
+def sheets_in_flight(app, pool):
+    return app.config['LABEL_SHEETS_IN_FLIGHT'] or 2 * pool.processes
+
+
+class PdfStream:
+    """A PDF written front to back, one image per page.
+
+    Object 1 is the catalog and object 2 the page tree; both are written
+    last, once every page is known, so pages can go out as soon as they are
+    drawn.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.pages = []
+        self.next_id = 3
+
+    def _write(self, data):
+        self.offset += len(data)
+        return data
+
+    def _object(self, number, body):
+        self.offsets[number] = self.offset
+        return self._write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def header(self):
+        return self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def page(self, bitmap, width_px, height_px, width_mm, height_mm):
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        self.pages.append(page_id)
+        width_pt, height_pt = width_mm * 72 / 25.4, height_mm * 72 / 25.4
+        content = b'q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q' % (width_pt, height_pt)
+        return b''.join((
+            self._object(image_id, b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray '
+                                   b'/BitsPerComponent 1 /Filter /FlateDecode /Length %d >>\nstream\n'
+                         % (width_px, height_px, len(bitmap)) + bitmap + b'\nendstream'),
+            self._object(content_id, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream'),
+            self._object(page_id, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] '
+                                  b'/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>'
+                         % (width_pt, height_pt, image_id, content_id)),
+        ))
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.pages)
+        data = self._object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+        data += self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref_offset = self.offset
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id]
+        xref += [b'%010d 00000 n \n' % self.offsets[number] for number in range(1, self.next_id)]
+        xref.append(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_id, xref_offset))
+        return data + self._write(b''.join(xref))
+
+
+class _ZipBuffer(io.RawIOBase):
+    # Unseekable sink: zipfile writes data descriptors and never seeks back,
+    # so each entry can be handed out as soon as it is written
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _in_order(pool, sheets, layout_name, dpi, fmt, in_flight):
+    # Keeps ``in_flight`` sheets rendering and yields them in submission order
+    pending = deque()
+    try:
+        for sheet in sheets:
+            pending.append(pool.submit(render_sheet, sheet, layout_name, dpi, fmt))
+            if len(pending) >= in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # The client went away or a render failed: drop the queued sheets
+        for future in pending:
+            future.cancel()
+
+
+def iter_label_sheets(labels, fmt, pool, layout_name='a4-21', dpi=300, in_flight=4):
+    """Yield the bytes of a PDF (``fmt='pdf'``) or a ZIP of PNG sheets (``'zip'``) for ``labels``."""
+    layout = LAYOUTS[layout_name]
+    sheets = batched(labels, layout.columns * layout.rows)
+    rendered = _in_order(pool, sheets, layout_name, dpi, 'pdf' if fmt == 'pdf' else 'png', in_flight)
+    width_px, height_px = (int(round(size * dpi / 25.4)) for size in (layout.page_width, layout.page_height))
+
+    if fmt == 'pdf':
+        pdf = PdfStream()
+        yield pdf.header()
+        for bitmap in rendered:
+            yield pdf.page(bitmap, width_px, height_px, layout.page_width, layout.page_height)
+        yield pdf.close()
+        return
+
+    sink = _ZipBuffer()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for number, png in enumerate(rendered, 1):
+            archive.writestr(f'labels-{number:04d}.png', png)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,187 @@
+"""Maintenance windows: scheduling, overlap checks, the calendar and repair status.
+
+A window runs from ``start_date`` to ``end_date`` inclusive; an open-ended
+job has no ``end_date`` yet. A window overlaps the range [start, end] when
+it starts on or before ``end`` and has not ended before ``start``. Asking
+for exactly that in one WHERE clause makes the database read every window
+that ever started before ``end``, so the calendar splits it into three
+index range scans whose cost follows the size of the answer:
+
+- windows starting inside the range, on (start_date, end_date)
+- closed windows that started earlier and end inside or after it, on
+  (end_date, start_date)
+- open-ended windows that started on or before ``end``, on (end_date,
+  start_date) with ``end_date IS NULL``
+
+Per-asset checks use (asset_id, start_date).
+
+An asset is "Under Repair" from a window's start date until its end date,
+when it is back in service (or indefinitely for an open-ended job).
+Scheduling a window that covers today sets the status straight away, and
+closing the window that covered today sets it back; a status set by hand
+is left alone otherwise.
+``sync_repair_status`` catches windows that open or close with the passing
+of time and should run daily.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import and_, or_, select
+
+from .database import IN_CHUNK_SIZE, batched
+from .models import db, Asset, Maintenance
+
+UNDER_REPAIR = 'Under Repair'
+
+
+class MaintenanceConflict(ValueError):
+    pass
+
+
+def _covers(start, end):
+    # Overlap with [start, end]; end=None means "from start onwards"
+    clauses = [or_(Maintenance.end_date.is_(None), Maintenance.end_date >= start)]
+    if end is not None:
+        clauses.append(Maintenance.start_date <= end)
+    return and_(*clauses)
+
+
+def overlapping_window(asset_id, start, end, exclude_id=None):
+    """The first window of ``asset_id`` overlapping [start, end], or ``None``."""
+    stmt = select(Maintenance).where(Maintenance.asset_id == asset_id, _covers(start, end))
+    if exclude_id is not None:
+        stmt = stmt.where(Maintenance.id != exclude_id)
+    return db.session.execute(stmt.order_by(Maintenance.start_date).limit(1)).scalars().first()
+
+
+def calendar_statements(start, end, location_id=None):
+    """The three index range scans that together return every window overlapping [start, end]."""
+    starting_inside = select(Maintenance).where(Maintenance.start_date.between(start, end))
+    ending_inside_or_after = select(Maintenance).where(
+        Maintenance.end_date >= start, Maintenance.start_date < start)
+    open_ended = select(Maintenance).where(Maintenance.end_date.is_(None), Maintenance.start_date < start)
+    statements = (starting_inside, ending_inside_or_after, open_ended)
+    if location_id is not None:
+        # "+ 0" keeps SQLite from walking every asset in the location through
+        # ix_asset_location_sublocation; the date range is the selective part
+        statements = tuple(stmt.join(Asset, Asset.id == Maintenance.asset_id).where(Asset.location_id + 0 == location_id)
+                           for stmt in statements)
+    return statements
+
+
+def calendar(start, end, location_id=None, earlier_open_ended=True):
+    """Windows overlapping [start, end], optionally for one location, ordered by start date.
+
+    ``earlier_open_ended=False`` leaves out open-ended windows started before
+    ``start``, which can run into thousands; page through ``open_ended`` instead.
+    """
+    statements = calendar_statements(start, end, location_id)
+    if not earlier_open_ended:
+        statements = statements[:2]
+    windows = []
+    for stmt in statements:
+        windows.extend(db.session.execute(stmt).scalars())
+    return sorted(windows, key=lambda window: (window.start_date, window.id))
+
+
+def open_ended_statement(end, location_id=None):
+    """Open-ended windows started on or before ``end``, oldest first (so the most overdue lead)."""
+    stmt = select(Maintenance).where(Maintenance.end_date.is_(None), Maintenance.start_date <= end)
+    if location_id is not None:
+        stmt = stmt.join(Asset, Asset.id == Maintenance.asset_id).where(Asset.location_id + 0 == location_id)
+    return stmt.order_by(Maintenance.start_date, Maintenance.id)
+
+
+def open_ended(end, location_id=None, limit=None, offset=0):
+    stmt = open_ended_statement(end, location_id).offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.session.execute(stmt).scalars().all()
+
+
+def is_overdue(window, overdue_days, today=None):
+    today = today or date.today()
+    return window.end_date is None and window.start_date < today - timedelta(days=overdue_days)
+
+
+def in_progress(window, today):
+    return window.start_date <= today and (window.end_date is None or window.end_date > today)
+
+
+def _start_repair(asset):
+    if asset.status not in ('Disposed', UNDER_REPAIR):
+        asset.status = UNDER_REPAIR
+
+
+def _end_repair(asset):
+    # Windows of one asset never overlap, so once the window covering today
+    # ends, none does
+    if asset.status == UNDER_REPAIR:
+        asset.status = 'Active'
+
+
+def schedule_window(asset, start_date, end_date, maintenance_type, description='', today=None):
+    """Add a window for ``asset``; raises ``MaintenanceConflict`` if it overlaps another one.
+
+    The row is flushed before the overlap check. On SQLite the flush takes the
+    write lock, so a concurrent request scheduling the same asset waits and
+    then sees this window. The caller commits.
+    """
+    if end_date is not None and end_date < start_date:
+        raise ValueError('End date cannot be before the start date')
+    maintenance = Maintenance(asset_id=asset.id, start_date=start_date, end_date=end_date,
+                              type=maintenance_type, description=description)
+    db.session.add(maintenance)
+    db.session.flush()
+    clash = overlapping_window(asset.id, start_date, end_date, exclude_id=maintenance.id)
+    if clash is not None:
+        until = clash.end_date.isoformat() if clash.end_date else 'open-ended'
+        raise MaintenanceConflict(
+            f'Overlaps {clash.type} maintenance scheduled {clash.start_date.isoformat()} to {until}')
+    # A window that has not started yet leaves the status alone, including
+    # an "Under Repair" set by hand
+    if in_progress(maintenance, today or date.today()):
+        _start_repair(asset)
+    return maintenance
+
+
+def close_window(maintenance, end_date=None, today=None):
+    """End an open window (today by default) and update the asset's status. The caller commits."""
+    end_date = end_date or date.today()
+    if end_date < maintenance.start_date:
+        raise ValueError('End date cannot be before the start date')
+    clash = overlapping_window(maintenance.asset_id, maintenance.start_date, end_date, exclude_id=maintenance.id)
+    if clash is not None:
+        raise MaintenanceConflict(f'Would overlap {clash.type} maintenance starting {clash.start_date.isoformat()}')
+    today = today or date.today()
+    was_covering = in_progress(maintenance, today)
+    maintenance.end_date = end_date
+    db.session.flush()
+    if was_covering and not in_progress(maintenance, today):
+        _end_repair(db.session.get(Asset, maintenance.asset_id))
+
+
+def sync_repair_status(today=None):
+    """Bring every asset's repair status in line with the windows in progress on ``today``.
+
+    Returns ``(opened, closed)`` counts and commits. Only assets with
+    maintenance records go back to Active, so an asset marked "Under Repair"
+    by hand with no window stays as it is.
+    """
+    today = today or date.today()
+    covered = {window.asset_id for window in calendar(today, today) if in_progress(window, today)}
+
+    opened = closed = 0
+    for chunk in batched(sorted(covered), IN_CHUNK_SIZE):
+        for asset in db.session.execute(
+                select(Asset).where(Asset.id.in_(chunk), Asset.status == 'Active')).scalars():
+            asset.status = UNDER_REPAIR
+            opened += 1
+    with_records = select(Maintenance.asset_id).where(Maintenance.asset_id == Asset.id).exists()
+    for asset in db.session.execute(
+            select(Asset).where(Asset.status == UNDER_REPAIR, with_records)).scalars():
+        if asset.id not in covered:
+            asset.status = 'Active'
+            closed += 1
+    # ORM updates so the rollup counts and the change feed follow the status changes
+    db.session.commit()
+    return opened, closed
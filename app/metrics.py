@@ -0,0 +1,200 @@
+"""In-process request, SQL, barcode and serial-allocation metrics.
+
+Every request records its latency, query count and time spent in SQL, keyed
+by endpoint. The counts come from engine ``before/after_cursor_execute``
+hooks that add to counters on ``flask.g``. ``/metrics`` renders everything in
+the Prometheus text format. Recording costs two ``perf_counter`` calls per
+query and one locked histogram update per observation, so it can stay on in
+production.
+
+Each process keeps its own numbers, so with several gunicorn workers a
+scrape reports only the worker that happened to answer it.
+
+With ``SLOW_REQUEST_MS`` set, a request slower than that is logged at WARNING
+together with every SQL statement it issued and how long each took.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Statements kept per request for the slow-request log
+SLOW_LOG_MAX_STATEMENTS = 100
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (non-cumulative) + overflow, sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                le = bound if bound == '+Inf' else _format_value(float(bound))
+                yield f'{self.name}_bucket', _format_labels(self.labelnames, key, [('le', le)]), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labelnames, key), total
+            yield f'{self.name}_count', _format_labels(self.labelnames, key), count
+
+
+REGISTRY = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+REQUEST_SECONDS = _register(Histogram(
+    'asset_manager_request_duration_seconds', 'Time to produce a response, by endpoint.',
+    ('endpoint', 'method', 'status')))
+REQUEST_QUERIES = _register(Histogram(
+    'asset_manager_request_queries', 'SQL statements executed per request, by endpoint.',
+    ('endpoint',), buckets=QUERY_COUNT_BUCKETS))
+REQUEST_SQL_SECONDS = _register(Histogram(
+    'asset_manager_request_sql_duration_seconds', 'Time spent executing SQL per request, by endpoint.',
+    ('endpoint',)))
+SQL_QUERIES = _register(Counter(
+    'asset_manager_sql_queries_total', 'SQL statements executed, inside and outside requests.'))
+SQL_SECONDS = _register(Counter(
+    'asset_manager_sql_duration_seconds_total', 'Time spent executing SQL, inside and outside requests.'))
+SLOW_REQUESTS = _register(Counter(
+    'asset_manager_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS, by endpoint.', ('endpoint',)))
+BARCODE_RENDER_SECONDS = _register(Histogram(
+    'asset_manager_barcode_render_seconds', 'Time to render one barcode image.', ('format', 'source')))
+SERIAL_ALLOCATION_SECONDS = _register(Histogram(
+    'asset_manager_serial_allocation_seconds', 'Time to reserve serial suffixes, including lock waits.'))
+
+
+def render_latest():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        SQL_QUERIES.inc()
+        SQL_SECONDS.inc(elapsed)
+        if has_request_context() and 'metrics_queries' in g:
+            g.metrics_queries += 1
+            g.metrics_sql_seconds += elapsed
+            if g.metrics_statements is not None and len(g.metrics_statements) < SLOW_LOG_MAX_STATEMENTS:
+                g.metrics_statements.append((elapsed, statement))
+
+
+def init_app(app):
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_sql_seconds = 0.0
+        # Statements are only kept when the slow-request log may need them
+        g.metrics_statements = [] if app.config['SLOW_REQUEST_MS'] else None
+
+    @app.after_request
+    def _record_request_metrics(response):
+        if 'metrics_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        endpoint = _endpoint()
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=str(response.status_code))
+        REQUEST_QUERIES.observe(g.metrics_queries, endpoint=endpoint)
+        REQUEST_SQL_SECONDS.observe(g.metrics_sql_seconds, endpoint=endpoint)
+
+        threshold = app.config['SLOW_REQUEST_MS']
+        if threshold and elapsed * 1000 >= threshold:
+            SLOW_REQUESTS.inc(endpoint=endpoint)
+            statements = '\n'.join(f'  {seconds * 1000:8.1f} ms  {" ".join(sql.split())}'
+                                   for seconds, sql in g.metrics_statements)
+            if g.metrics_queries > len(g.metrics_statements):
+                statements += f'\n  ... {g.metrics_queries - len(g.metrics_statements)} more'
+            app.logger.warning('Slow request %s %s (%s): %.1f ms, %d queries, %.1f ms in SQL\n%s',
+                               request.method, request.full_path.rstrip('?'), endpoint, elapsed * 1000,
+                               g.metrics_queries, g.metrics_sql_seconds * 1000, statements)
+        return response
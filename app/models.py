@@ -1,7 +1,11 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+ASSET_STATUSES = ('Active', 'Under Repair', 'Disposed')
+
 class Location(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
@@ -24,6 +28,12 @@ class SubCategory(db.Model):
     code = db.Column(db.String(10), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
 
+class RefDataVersion(db.Model):
+    # Single row bumped on every write to the four reference tables so each
+    # worker process can tell when its cached copy (see refdata.py) is stale
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class Asset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -36,7 +46,11 @@ class Asset(db.Model):
     assigned_to = db.Column(db.String(100))
     depreciation = db.Column(db.Float, nullable=False)
     purchased_on = db.Column(db.Date, nullable=False)
+    purchase_cost = db.Column(db.Float, nullable=False, default=0.0)
     serial_number = db.Column(db.String(100), unique=True, nullable=False)
+    # Bumped by every UPDATE; a write based on an older version fails with
+    # StaleDataError instead of overwriting someone else's change
+    version = db.Column(db.Integer, nullable=False, default=1)
     
     # Relationships
     category = db.relationship('Category', backref='assets')
@@ -44,23 +58,117 @@ class Asset(db.Model):
     location = db.relationship('Location', backref='assets')
     sub_location = db.relationship('SubLocation', backref='assets')
 
+    # Indexes backing the list_assets filters. SQLite appends the rowid to
+    # every secondary index, so an index serves the keyset ORDER BY id only
+    # when the filter pins all of its columns; a filter on the leading column
+    # alone sorts every match in a temp B-tree, hence the single-column ones.
+    __table_args__ = (
+        db.Index('ix_asset_status', 'status'),
+        db.Index('ix_asset_location', 'location_id'),
+        db.Index('ix_asset_category', 'category_id'),
+        db.Index('ix_asset_status_location', 'status', 'location_id'),
+        db.Index('ix_asset_location_sublocation', 'location_id', 'sublocation_id'),
+        db.Index('ix_asset_sublocation', 'sublocation_id'),
+        db.Index('ix_asset_category_subcategory', 'category_id', 'subcategory_id'),
+        db.Index('ix_asset_subcategory', 'subcategory_id'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+
+class AssetChange(db.Model):
+    # Append-only feed of writes to Asset and its maintenance windows, read
+    # by downstream systems from the last seq they saw (see changes.py). No
+    # foreign key, so the history outlives the asset.
+    seq = db.Column(db.Integer, primary_key=True)
+    asset_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer)  # asset version after the change; NULL for maintenance entries
+    action = db.Column(db.String(20), nullable=False)
+    data = db.Column(db.JSON, nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    # AUTOINCREMENT: SQLite never hands out a seq again, even after the
+    # highest rows are deleted, so a consumer's cursor stays valid
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class SerialSequence(db.Model):
+    # Last serial suffix handed out per category, the scope a serial is unique
+    # in (it carries no subcategory code); see serials.py
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+class AssetRollup(db.Model):
+    # Number of assets per combination of the list filters, kept up to date
+    # by every write to Asset (see rollups.py) so counts never scan Asset
+    status = db.Column(db.String(50), primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), primary_key=True)
+    sublocation_id = db.Column(db.Integer, db.ForeignKey('sub_location.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    subcategory_id = db.Column(db.Integer, db.ForeignKey('sub_category.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
 class AssetMovement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), nullable=False)
     from_location_id = db.Column(db.Integer, db.ForeignKey('location.id'))
     to_location_id = db.Column(db.Integer, db.ForeignKey('location.id'))
+    from_sublocation_id = db.Column(db.Integer, db.ForeignKey('sub_location.id'))
+    to_sublocation_id = db.Column(db.Integer, db.ForeignKey('sub_location.id'))
+    # Serial before and after the move (the same when the location is unchanged)
+    old_serial = db.Column(db.String(100))
+    new_serial = db.Column(db.String(100))
     movement_date = db.Column(db.Date, nullable=False)
 
+    # Point-in-time lookups (see movements.py) are range scans on these
+    __table_args__ = (
+        db.Index('ix_asset_movement_asset_date', 'asset_id', 'movement_date'),
+        db.Index('ix_asset_movement_to_location_date', 'to_location_id', 'movement_date'),
+        db.Index('ix_asset_movement_from_location_date', 'from_location_id', 'movement_date'),
+        # Scans of labels printed before a move (see scans.py)
+        db.Index('ix_asset_movement_old_serial', 'old_serial', 'movement_date'),
+    )
+
 class Maintenance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
-    end_date = db.Column(db.Date)
+    end_date = db.Column(db.Date)  # NULL while the job is open-ended
     type = db.Column(db.String(50), nullable=False)
     description = db.Column(db.String(200))
 
+    # Window lookups by asset, by start and by end (see maintenance.py)
+    __table_args__ = (
+        db.Index('ix_maintenance_asset_start', 'asset_id', 'start_date'),
+        db.Index('ix_maintenance_start_end', 'start_date', 'end_date'),
+        db.Index('ix_maintenance_end_start', 'end_date', 'start_date'),
+    )
+
 class Disposal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), nullable=False)
+    asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), nullable=False, index=True)
     disposal_date = db.Column(db.Date, nullable=False)
     reason = db.Column(db.String(200))
+
+class DepreciationSnapshot(db.Model):
+    # Accumulated depreciation and book value of every non-disposed asset as
+    # of snapshot_date (see depreciation.py). The input columns are copied so
+    # a recompute can tell which rows are out of date.
+    snapshot_date = db.Column(db.Date, primary_key=True)
+    asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=False)
+    purchase_cost = db.Column(db.Float, nullable=False)
+    depreciation_rate = db.Column(db.Float, nullable=False)
+    purchased_on = db.Column(db.Date, nullable=False)
+    accumulated_depreciation = db.Column(db.Float, nullable=False)
+    book_value = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_depreciation_snapshot_category', 'snapshot_date', 'category_id'),
+        db.Index('ix_depreciation_snapshot_location', 'snapshot_date', 'location_id'),
+    )
+
+def ensure_indexes(engine):
+    # create_all() skips tables that already exist, so indexes added to the
+    # models later would never reach an existing database without this
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
@@ -0,0 +1,269 @@
+"""Moving assets between locations, one or thousands at a time.
+
+A move is validated in full before anything is written. The assets are
+loaded with one query, the new serials are checked for clashes with one
+indexed IN query, and then the serial rewrites, the ``AssetMovement`` rows
+and the change feed entries are each written with a single executemany
+statement in the caller's transaction. Either every asset moves or none
+does. The update carries the version each asset was read at, so an
+asset changed by someone else in between raises ``StaleDataError`` instead
+of being moved from a position it no longer has.
+
+Each movement records the location, sublocation and serial on both sides, so
+where an asset was on any date can be read back from the movement table.
+The asset row holds the present. Working backwards from it, an asset's
+position on date D is the "from" side of its first movement after D, or its
+current position if it has not moved since. Both halves of that are range
+scans on the (asset_id, movement_date) and (from_location_id, movement_date)
+indexes, so rebuilding a location's occupancy never reads the whole
+movement history.
+"""
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import and_, bindparam, case, exists, func, insert, or_, select, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.exc import StaleDataError
+
+from .changes import MOVE_FIELDS, change_entry, record_changes
+from .database import IN_CHUNK_SIZE, batched
+from .models import db, Asset, AssetMovement
+from .refdata import get_reference_data
+from .rollups import apply_deltas, rollup_key
+from .serials import format_serial, serial_suffix
+
+
+class MoveResult:
+    def __init__(self, key, asset_id=None, serial_number=None):
+        self.key = key
+        self.asset_id = asset_id
+        self.serial_number = serial_number
+        self.new_serial_number = None
+        self.status = 'unchanged'
+        self.error = None
+
+    def fail(self, message):
+        self.status = 'error'
+        self.error = message
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'asset_id': self.asset_id,
+            'serial_number': self.serial_number,
+            'new_serial_number': self.new_serial_number,
+            'status': self.status,
+            'error': self.error,
+        }
+
+
+def _load_assets(column, keys):
+    rows = {}
+    for chunk in batched(keys, IN_CHUNK_SIZE):
+        stmt = select(Asset.id, Asset.serial_number, Asset.status, Asset.category_id, Asset.subcategory_id,
+                      Asset.location_id, Asset.sublocation_id, Asset.version).where(column.in_(chunk))
+        for row in db.session.execute(stmt):
+            rows[getattr(row, column.key)] = row
+    return rows
+
+
+def _taken_serials(serials):
+    taken = set()
+    for chunk in batched(serials, IN_CHUNK_SIZE):
+        taken.update(db.session.execute(select(Asset.serial_number).where(Asset.serial_number.in_(chunk))).scalars())
+    return taken
+
+
+def _update_moved(values):
+    # Core executemany matching on the version each asset was read at. The ORM
+    # only checks versions one UPDATE per row on SQLite, whose executemany
+    # reports just the total row count; the total is all this check needs.
+    table = Asset.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('asset_id'), table.c.version == bindparam('read_version'))
+        .values(location_id=bindparam('location_id'), sublocation_id=bindparam('sublocation_id'),
+                serial_number=bindparam('serial_number'), version=table.c.version + 1)
+    )
+    matched = db.session.execute(stmt, values).rowcount
+    if matched != len(values):
+        raise StaleDataError(f'UPDATE of asset expected to update {len(values)} row(s); {matched} were matched.')
+
+
+def move_assets(location_id, sublocation_id, asset_ids=None, serials=None, movement_date=None):
+    """Move the given assets to ``location_id``/``sublocation_id``.
+
+    Assets are identified by ``asset_ids`` or by ``serials``. Returns
+    ``(ok, results)``, with one ``MoveResult`` per requested key. When ``ok``
+    is false nothing was written. Raises ``StaleDataError`` if one of the
+    assets changed after it was read. The caller commits.
+    """
+    ref = get_reference_data()
+    location = ref.location_by_id.get(location_id)
+    sublocation = ref.sublocation_by_id.get(sublocation_id)
+    if location is None or sublocation is None or sublocation.location_id != location_id:
+        raise ValueError('Invalid location or sublocation selected!')
+
+    column, keys = (Asset.id, asset_ids) if asset_ids is not None else (Asset.serial_number, serials)
+    keys = list(dict.fromkeys(keys))
+    assets = _load_assets(column, keys)
+
+    results = []
+    moving = []
+    for key in keys:
+        asset = assets.get(key)
+        if asset is None:
+            result = MoveResult(key)
+            result.fail('Asset not found')
+            results.append(result)
+            continue
+        result = MoveResult(key, asset.id, asset.serial_number)
+        results.append(result)
+        if asset.location_id == location_id and asset.sublocation_id == sublocation_id:
+            continue
+        result.status = 'moved'
+        # If location changed, update serial number, keeping the suffix
+        if asset.location_id != location_id:
+            result.new_serial_number = format_serial(
+                location.code, ref.category_by_id[asset.category_id].code, sublocation.code,
+                serial_suffix(asset.serial_number))
+        moving.append((asset, result))
+
+    renamed = [result for _, result in moving if result.new_serial_number]
+    taken = _taken_serials([result.new_serial_number for result in renamed])
+    seen = set()
+    for result in renamed:
+        if result.new_serial_number in taken or result.new_serial_number in seen:
+            result.fail(f'Serial number {result.new_serial_number} is already in use')
+        seen.add(result.new_serial_number)
+
+    if any(result.status == 'error' for result in results):
+        for _, result in moving:
+            if result.status == 'moved':
+                result.status = 'skipped'
+        return False, results
+    if not moving:
+        return True, results
+
+    movement_date = movement_date or date.today()
+    values = [
+        {'asset_id': asset.id, 'read_version': asset.version, 'location_id': location_id,
+         'sublocation_id': sublocation_id, 'serial_number': result.new_serial_number or asset.serial_number}
+        for asset, result in moving
+    ]
+    _update_moved(values)
+    record_changes(db.session.connection(), [
+        change_entry(row['asset_id'], row['read_version'] + 1, 'moved', row, MOVE_FIELDS) for row in values
+    ])
+    deltas = Counter()
+    for asset, _ in moving:
+        deltas[rollup_key(asset)] -= 1
+        deltas[rollup_key(dict(asset._mapping, location_id=location_id, sublocation_id=sublocation_id))] += 1
+    apply_deltas(db.session.connection(), deltas)
+    db.session.execute(insert(AssetMovement), [
+        {'asset_id': asset.id, 'from_location_id': asset.location_id, 'to_location_id': location_id,
+         'from_sublocation_id': asset.sublocation_id, 'to_sublocation_id': sublocation_id,
+         'old_serial': asset.serial_number, 'new_serial': result.new_serial_number or asset.serial_number,
+         'movement_date': movement_date}
+        for asset, result in moving
+    ])
+    return True, results
+
+
+def asset_timeline(asset_id):
+    """All movements of one asset, oldest first."""
+    return db.session.execute(
+        select(AssetMovement).where(AssetMovement.asset_id == asset_id)
+        .order_by(AssetMovement.movement_date, AssetMovement.id)
+    ).scalars().all()
+
+
+def _first_movement_after(asset_id, as_of):
+    return db.session.execute(
+        select(AssetMovement)
+        .where(AssetMovement.asset_id == asset_id, AssetMovement.movement_date > as_of)
+        .order_by(AssetMovement.movement_date, AssetMovement.id)
+        .limit(1)
+    ).scalars().first()
+
+
+def location_as_of(asset, as_of):
+    """Return ``(location_id, sublocation_id, serial_number)`` of ``asset`` at the end of ``as_of``.
+
+    Returns ``None`` if the asset had not been purchased yet. Movements recorded
+    before both sides were stored have no sublocation and no serial. A serial
+    only changes with the location, so for those the current serial is used
+    if the asset is back at that location, and ``None`` otherwise.
+    """
+    if asset.purchased_on > as_of:
+        return None
+    movement = _first_movement_after(asset.id, as_of)
+    if movement is None:
+        return asset.location_id, asset.sublocation_id, asset.serial_number
+    serial = movement.old_serial
+    if serial is None and movement.from_location_id == asset.location_id:
+        serial = asset.serial_number
+    return movement.from_location_id, movement.from_sublocation_id, serial
+
+
+def occupancy_statements(location_id, as_of, sublocation_id=None):
+    """The two halves of ``occupancy_as_of``: assets that stayed and assets that left since."""
+    later = aliased(AssetMovement)
+    # Still here and not moved since
+    stayed = (
+        select(Asset.id, Asset.serial_number)
+        .where(
+            Asset.location_id == location_id,
+            Asset.purchased_on <= as_of,
+            ~exists().where(later.asset_id == Asset.id, later.movement_date > as_of),
+        )
+    )
+    if sublocation_id is not None:
+        stayed = stayed.where(Asset.sublocation_id == sublocation_id)
+
+    # Moved away since: the first movement after as_of left from here
+    first = AssetMovement
+    left = (
+        # Older movement rows have no serial; see location_as_of
+        select(first.asset_id, func.coalesce(first.old_serial,
+                                             case((Asset.location_id == location_id, Asset.serial_number))))
+        .join(Asset, Asset.id == first.asset_id)
+        .where(
+            first.from_location_id == location_id,
+            first.movement_date > as_of,
+            Asset.purchased_on <= as_of,
+            ~exists().where(
+                later.asset_id == first.asset_id,
+                later.movement_date > as_of,
+                or_(later.movement_date < first.movement_date,
+                    and_(later.movement_date == first.movement_date, later.id < first.id)),
+            ),
+        )
+    )
+    if sublocation_id is not None:
+        left = left.where(first.from_sublocation_id == sublocation_id)
+
+    return stayed, left
+
+
+def occupancy_as_of(location_id, as_of, sublocation_id=None):
+    """Assets that were in ``location_id`` (optionally ``sublocation_id``) at the end of ``as_of``.
+
+    Returns ``(asset_id, serial_number)`` rows ordered by asset id, with the
+    serial the asset carried on that date.
+    """
+    rows = []
+    for stmt in occupancy_statements(location_id, as_of, sublocation_id):
+        rows.extend(db.session.execute(stmt).all())
+    return sorted(rows, key=lambda row: row[0])
+
+
+def movements_between(location_id, start, end):
+    """Movements into and out of ``location_id`` with ``start <= movement_date <= end``."""
+    into = select(AssetMovement).where(AssetMovement.to_location_id == location_id,
+                                       AssetMovement.movement_date.between(start, end))
+    out_of = select(AssetMovement).where(AssetMovement.from_location_id == location_id,
+                                         AssetMovement.movement_date.between(start, end))
+    movements = {m.id: m for m in db.session.execute(into).scalars()}
+    movements.update((m.id, m) for m in db.session.execute(out_of).scalars())
+    return sorted(movements.values(), key=lambda m: (m.movement_date, m.id))
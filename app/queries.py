@@ -0,0 +1,61 @@
+from sqlalchemy.orm import joinedload
+
+from .models import Asset
+
+# Query-string parameter -> Asset column used by the list filters
+ASSET_FILTERS = {
+    'status': Asset.status,
+    'location': Asset.location_id,
+    'sublocation': Asset.sublocation_id,
+    'category': Asset.category_id,
+    'subcategory': Asset.subcategory_id,
+}
+
+
+def asset_filters_from_args(args):
+    """Return the non-empty list filters present in a request's query string."""
+    return {key: args.get(key) for key in ASSET_FILTERS if args.get(key)}
+
+
+def filter_assets(query, filters):
+    for key, value in filters.items():
+        query = query.filter(ASSET_FILTERS[key] == value)
+    return query
+
+
+def with_reference_data(query):
+    # Many-to-one lookups: one JOIN instead of four lazy loads per row
+    return query.options(
+        joinedload(Asset.category),
+        joinedload(Asset.subcategory),
+        joinedload(Asset.location),
+        joinedload(Asset.sub_location),
+    )
+
+
+def keyset_page(query, per_page, after=None, before=None):
+    """Fetch one page of ``query`` ordered by ``Asset.id`` using seek pagination.
+
+    ``after`` returns the rows following that id, ``before`` the rows preceding
+    it. Returns ``(rows, prev_cursor, next_cursor)``; a cursor is ``None`` when
+    there is nothing further in that direction.
+    """
+    if before is not None:
+        rows = (query.filter(Asset.id < before)
+                .order_by(Asset.id.desc())
+                .limit(per_page + 1)
+                .all())
+        has_more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        prev_cursor = rows[0].id if rows and has_more else None
+        next_cursor = rows[-1].id if rows else None
+        return rows, prev_cursor, next_cursor
+
+    if after is not None:
+        query = query.filter(Asset.id > after)
+    rows = query.order_by(Asset.id).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    prev_cursor = rows[0].id if rows and after is not None else None
+    next_cursor = rows[-1].id if rows and has_more else None
+    return rows, prev_cursor, next_cursor
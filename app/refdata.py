@@ -0,0 +1,143 @@
+"""Process-wide cache of the location and category reference tables.
+
+The tables only change through ``flask load-data`` and the admin pages,
+so every process keeps one immutable snapshot of them and reloads it when the
+shared ``RefDataVersion`` counter moves. Any flush that touches one of the
+reference models bumps the counter in the same transaction.
+"""
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from flask import g, has_request_context
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from .models import db, Location, SubLocation, Category, SubCategory, RefDataVersion
+
+LocationRow = namedtuple('LocationRow', 'id name code')
+SubLocationRow = namedtuple('SubLocationRow', 'id name code location_id')
+CategoryRow = namedtuple('CategoryRow', 'id name code')
+SubCategoryRow = namedtuple('SubCategoryRow', 'id name code category_id')
+
+REFERENCE_MODELS = (Location, SubLocation, Category, SubCategory)
+
+_VERSION_ROW_ID = 1
+
+
+class ReferenceData:
+    """Immutable snapshot of the reference tables at one version."""
+
+    def __init__(self, version, locations, sublocations, categories, subcategories):
+        self.version = version
+        self.locations = tuple(locations)
+        self.sublocations = tuple(sublocations)
+        self.categories = tuple(categories)
+        self.subcategories = tuple(subcategories)
+
+        # id -> row (row.code gives the code)
+        self.location_by_id = MappingProxyType({row.id: row for row in self.locations})
+        self.sublocation_by_id = MappingProxyType({row.id: row for row in self.sublocations})
+        self.category_by_id = MappingProxyType({row.id: row for row in self.categories})
+        self.subcategory_by_id = MappingProxyType({row.id: row for row in self.subcategories})
+
+        # code -> id; child codes are only unique within their parent
+        self.location_id_by_code = MappingProxyType({row.code: row.id for row in self.locations})
+        self.category_id_by_code = MappingProxyType({row.code: row.id for row in self.categories})
+        self.sublocation_id_by_code = MappingProxyType(
+            {(row.location_id, row.code): row.id for row in self.sublocations})
+        self.subcategory_id_by_code = MappingProxyType(
+            {(row.category_id, row.code): row.id for row in self.subcategories})
+
+        # parent id -> tuple of its children, for the cascading selects
+        self.sublocations_by_location = _group(self.sublocations, 'location_id')
+        self.subcategories_by_category = _group(self.subcategories, 'category_id')
+
+    def template_context(self, location_id=None, category_id=None):
+        """Every location and category, but only the children of the selected ones.
+
+        The pages load other children on demand from the JSON endpoints, so a
+        page never embeds the whole sublocation and subcategory tables.
+        """
+        return dict(locations=self.locations, categories=self.categories,
+                    sublocations=self.sublocations_by_location.get(location_id, ()),
+                    subcategories=self.subcategories_by_category.get(category_id, ()))
+
+
+def _group(rows, parent):
+    groups = {}
+    for row in rows:
+        groups.setdefault(getattr(row, parent), []).append(row)
+    return MappingProxyType({key: tuple(children) for key, children in groups.items()})
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def current_version(session=None):
+    session = session or db.session
+    version = session.execute(
+        select(RefDataVersion.version).where(RefDataVersion.id == _VERSION_ROW_ID)
+    ).scalar()
+    return version or 0
+
+
+def _load(version):
+    session = db.session
+
+    def rows(row_type, model):
+        columns = [getattr(model, field) for field in row_type._fields]
+        return [row_type(*row) for row in session.execute(select(*columns).order_by(model.id))]
+
+    return ReferenceData(
+        version,
+        rows(LocationRow, Location),
+        rows(SubLocationRow, SubLocation),
+        rows(CategoryRow, Category),
+        rows(SubCategoryRow, SubCategory),
+    )
+
+
+def get_reference_data():
+    """Return the current snapshot, reloading it if another writer bumped the version.
+
+    The version is checked once per request; outside a request it is checked
+    on every call.
+    """
+    global _snapshot
+    if has_request_context() and '_reference_data' in g:
+        return g._reference_data
+
+    version = current_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                # Tables are read after the version, so the snapshot is never
+                # older than the version it is tagged with
+                snapshot = _snapshot = _load(version)
+
+    if has_request_context():
+        g._reference_data = snapshot
+    return snapshot
+
+
+def bump_version(connection):
+    """Invalidate every process's snapshot; call inside the writing transaction."""
+    table = RefDataVersion.__table__
+    result = connection.execute(
+        update(table).where(table.c.id == _VERSION_ROW_ID).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(id=_VERSION_ROW_ID, version=1))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_reference_write(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state at this point
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, REFERENCE_MODELS):
+            bump_version(session.connection())
+            return
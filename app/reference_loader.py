@@ -0,0 +1,116 @@
+"""Loading the location and category reference tables from CSV files.
+
+The default files ship next to this module. Rows whose code already exists
+are skipped, so loading the same files again only adds what is new.
+"""
+import csv
+import os
+
+from sqlalchemy import select
+
+from .models import db, Location, SubLocation, Category, SubCategory
+from .importer import bulk_insert
+from .refdata import get_reference_data
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_locations(filepath=os.path.join(DATA_DIR, 'locations.csv')):
+    # Existing codes are loaded once instead of queried per row
+    existing = set(db.session.execute(select(Location.code)).scalars())
+    with open(filepath, 'r') as file:
+        reader = csv.DictReader(file)
+        rows = []
+        for row in reader:
+            # Check if location already exists
+            if row['code'] not in existing:
+                existing.add(row['code'])
+                rows.append({'name': row['name'], 'code': row['code']})
+        count = bulk_insert(Location, rows)
+    print(f"Loaded {count} locations from {filepath}")
+
+
+def load_sublocations(filepath=os.path.join(DATA_DIR, 'sublocations.csv')):
+    ref = get_reference_data()
+    existing = set(ref.sublocation_id_by_code)
+    with open(filepath, 'r') as file:
+        reader = csv.DictReader(file)
+        rows = []
+        skipped = 0
+        for row in reader:
+            # Skip empty rows
+            if not row.get('code') or not (row.get('location_code') or row.get('location_id')):
+                skipped += 1
+                continue
+            
+            # Look up location by code (preferred) or by ID (backward compatibility)
+            if 'location_code' in row and row['location_code']:
+                location_id = ref.location_id_by_code.get(row['location_code'])
+                if location_id is None:
+                    print(f"  Warning: Location with code '{row['location_code']}' not found. Skipping sublocation '{row['code']}'.")
+                    skipped += 1
+                    continue
+            else:
+                # Backward compatibility: use location_id if provided
+                location_id = int(row['location_id'])
+            
+            # Check if sublocation already exists
+            if (location_id, row['code']) not in existing:
+                existing.add((location_id, row['code']))
+                rows.append({'name': row['name'], 'code': row['code'], 'location_id': location_id})
+        count = bulk_insert(SubLocation, rows)
+    print(f"Loaded {count} sublocations from {filepath}" + (f" ({skipped} skipped)" if skipped > 0 else ""))
+
+
+def load_categories(filepath=os.path.join(DATA_DIR, 'categories.csv')):
+    existing = set(db.session.execute(select(Category.code)).scalars())
+    with open(filepath, 'r') as file:
+        reader = csv.DictReader(file)
+        rows = []
+        for row in reader:
+            # Check if category already exists
+            if row['code'] not in existing:
+                existing.add(row['code'])
+                rows.append({'name': row['name'], 'code': row['code']})
+        count = bulk_insert(Category, rows)
+    print(f"Loaded {count} categories from {filepath}")
+
+
+def load_subcategories(filepath=os.path.join(DATA_DIR, 'subcategories.csv')):
+    ref = get_reference_data()
+    existing = set(ref.subcategory_id_by_code)
+    with open(filepath, 'r') as file:
+        reader = csv.DictReader(file)
+        rows = []
+        skipped = 0
+        for row in reader:
+            # Skip empty rows
+            if not row.get('code') or not (row.get('category_code') or row.get('category_id')):
+                skipped += 1
+                continue
+            
+            # Look up category by code (preferred) or by ID (backward compatibility)
+            if 'category_code' in row and row['category_code']:
+                category_id = ref.category_id_by_code.get(row['category_code'])
+                if category_id is None:
+                    print(f"  Warning: Category with code '{row['category_code']}' not found. Skipping subcategory '{row['code']}'.")
+                    skipped += 1
+                    continue
+            else:
+                # Backward compatibility: use category_id if provided
+                category_id = int(row['category_id'])
+            
+            # Check if subcategory already exists
+            if (category_id, row['code']) not in existing:
+                existing.add((category_id, row['code']))
+                rows.append({'name': row['name'], 'code': row['code'], 'category_id': category_id})
+        count = bulk_insert(SubCategory, rows)
+    print(f"Loaded {count} subcategories from {filepath}" + (f" ({skipped} skipped)" if skipped > 0 else ""))
+
+
+def load_reference_data(directory=DATA_DIR):
+    """Load locations, sublocations, categories and subcategories, parents first."""
+    load_locations(os.path.join(directory, 'locations.csv'))
+    load_sublocations(os.path.join(directory, 'sublocations.csv'))
+    load_categories(os.path.join(directory, 'categories.csv'))
+    load_subcategories(os.path.join(directory, 'subcategories.csv'))
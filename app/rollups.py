@@ -0,0 +1,169 @@
+"""Asset counts per (status, location, sublocation, category, subcategory).
+
+``AssetRollup`` holds one row per combination that has ever had assets, so
+the filter facets and the dashboard group that table in SQL instead of the
+whole register. It has at most one row per status and subcategory in each
+sublocation, far fewer than there are assets: about 14,000 for a generated
+register of 100,000.
+
+The table is kept current in the writing transaction: a ``before_flush``
+hook turns ORM inserts, deletes and changes to the rollup columns into
+count deltas, and the executemany paths (``bulk_insert``, the importer,
+``move_assets``) call ``apply_deltas`` themselves because bulk statements
+bypass the flush. Each delta is an upsert adding to the stored count, so
+concurrent writers never lose an update.
+
+``reconcile_rollups`` recomputes the table from ``Asset`` and reports any
+rows that had drifted.
+"""
+from collections import Counter
+
+from sqlalchemy import delete, event, func, inspect, insert, select
+from sqlalchemy.orm import Session
+
+from .models import db, Asset, AssetRollup
+
+ROLLUP_KEYS = ('status', 'location_id', 'sublocation_id', 'category_id', 'subcategory_id')
+
+
+def rollup_key(values):
+    """The rollup key of an asset given as a mapping or a row with the key attributes."""
+    if isinstance(values, dict):
+        return tuple(values[key] for key in ROLLUP_KEYS)
+    return tuple(getattr(values, key) for key in ROLLUP_KEYS)
+
+
+def _upsert(connection):
+    table = AssetRollup.__table__
+    if connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEYS), set_={'count': table.c.count + stmt.excluded['count']}
+    )
+
+
+def apply_deltas(connection, deltas):
+    """Add a Counter of ``rollup key -> change in count`` to the stored counts."""
+    rows = [dict(zip(ROLLUP_KEYS, key), count=change) for key, change in deltas.items() if change]
+    if not rows:
+        return
+    stmt = _upsert(connection)
+    if stmt is not None:
+        connection.execute(stmt, rows)
+        return
+    # No native upsert: update what exists, insert the rest
+    table = AssetRollup.__table__
+    for row in rows:
+        where = [table.c[key] == row[key] for key in ROLLUP_KEYS]
+        if connection.execute(table.update().where(*where).values(count=table.c.count + row['count'])).rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+
+def _previous_key(state):
+    key = []
+    for name in ROLLUP_KEYS:
+        history = state.attrs[name].history
+        key.append(history.deleted[0] if history.deleted else getattr(state.obj(), name))
+    return tuple(key)
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_asset_counts(session, flush_context, instances):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Asset):
+            deltas[rollup_key(obj)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Asset):
+            deltas[_previous_key(inspect(obj))] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Asset) and obj not in session.deleted:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in ROLLUP_KEYS):
+                deltas[_previous_key(state)] -= 1
+                deltas[rollup_key(obj)] += 1
+    if any(deltas.values()):
+        apply_deltas(session.connection(), deltas)
+
+
+def _actual_counts():
+    columns = [getattr(Asset, key) for key in ROLLUP_KEYS]
+    rows = db.session.execute(select(*columns, func.count()).group_by(*columns))
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def _stored_counts():
+    columns = [getattr(AssetRollup, key) for key in ROLLUP_KEYS]
+    rows = db.session.execute(select(*columns, AssetRollup.count))
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def reconcile_rollups(fix=True):
+    """Compare the rollup table with a full GROUP BY over ``Asset``.
+
+    Returns a list of ``(key, stored, actual)`` for every key that differs.
+    With ``fix`` the table is rewritten from the actual counts and committed.
+    """
+    actual = _actual_counts()
+    stored = _stored_counts()
+    drift = [
+        (key, stored.get(key, 0), actual.get(key, 0))
+        for key in sorted(set(actual) | set(stored), key=repr)
+        if stored.get(key, 0) != actual.get(key, 0)
+    ]
+    if fix and drift:
+        db.session.execute(delete(AssetRollup))
+        if actual:
+            db.session.execute(insert(AssetRollup), [dict(zip(ROLLUP_KEYS, key), count=count)
+                                                     for key, count in actual.items()])
+        db.session.commit()
+    return drift
+
+
+def seed_rollups(engine):
+    """Fill an empty rollup table from existing assets (first start after upgrading)."""
+    with engine.begin() as connection:
+        if connection.execute(select(AssetRollup.count).limit(1)).first() is not None:
+            return
+        columns = [getattr(Asset, key) for key in ROLLUP_KEYS]
+        connection.execute(insert(AssetRollup).from_select(
+            [*ROLLUP_KEYS, 'count'], select(*columns, func.count()).group_by(*columns)))
+
+
+def facet_counts(filters):
+    """Counts for each filter dropdown, given the other active filters.
+
+    Returns ``{filter name: {value: count}}`` keyed like ``ASSET_FILTERS``
+    (``status``, ``location``, ...). Values are ids as ints, status as text.
+    """
+    dimensions = dict(zip(('status', 'location', 'sublocation', 'category', 'subcategory'), ROLLUP_KEYS))
+    active = {}
+    for name, value in filters.items():
+        if name in dimensions:
+            try:
+                active[name] = value if name == 'status' else int(value)
+            except ValueError:
+                active[name] = None  # matches nothing, like the list filter
+    facets = {}
+    for name, column in dimensions.items():
+        # One GROUP BY per facet; each ignores its own filter so the other
+        # options stay visible
+        key = getattr(AssetRollup, column)
+        stmt = select(key, func.sum(AssetRollup.count)).where(*(
+            getattr(AssetRollup, dimensions[other]) == value for other, value in active.items() if other != name
+        )).group_by(key).having(func.sum(AssetRollup.count) != 0)
+        facets[name] = Counter(dict(db.session.execute(stmt).all()))
+    return facets
+
+
+def totals_by(column):
+    """Asset counts grouped by one rollup column, e.g. ``'status'``."""
+    key = getattr(AssetRollup, column)
+    return db.session.execute(
+        select(key, func.sum(AssetRollup.count)).group_by(key).having(func.sum(AssetRollup.count) != 0)
+    ).all()
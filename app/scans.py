@@ -0,0 +1,134 @@
+"""Serial lookups for barcode scanners and stock-takes.
+
+A scan resolves through the unique ``serial_number`` index first. Labels
+printed before a move carry the serial the asset had then, so a miss falls
+back to ``AssetMovement.old_serial``: the latest move away from that serial
+names the asset. Both lookups read a handful of columns, and location and
+category codes come from the cached reference data, so a scan costs one or
+two index probes.
+
+A stock-take compares everything scanned in one sublocation with what the
+register expects there. The expected serials come from one range scan on
+``ix_asset_sublocation``, the scanned serials are resolved in chunks of
+``IN`` lookups, and the comparison itself is set arithmetic in Python.
+"""
+from sqlalchemy import select
+
+from .database import IN_CHUNK_SIZE, batched
+from .models import db, Asset, AssetMovement
+from .refdata import get_reference_data
+
+SCAN_COLUMNS = (Asset.id, Asset.serial_number, Asset.name, Asset.status, Asset.location_id,
+                Asset.sublocation_id, Asset.category_id, Asset.subcategory_id)
+
+
+def scan_record(row, ref=None):
+    """Compact JSON-ready view of a row of ``SCAN_COLUMNS``."""
+    ref = ref or get_reference_data()
+    return {
+        'id': row.id,
+        'serial_number': row.serial_number,
+        'name': row.name,
+        'status': row.status,
+        'location_id': row.location_id,
+        'location_code': ref.location_by_id[row.location_id].code,
+        'sublocation_id': row.sublocation_id,
+        'sublocation_code': ref.sublocation_by_id[row.sublocation_id].code,
+        'category_code': ref.category_by_id[row.category_id].code,
+        'subcategory_code': ref.subcategory_by_id[row.subcategory_id].code,
+    }
+
+
+def _by_serial(serials):
+    found = {}
+    for chunk in batched(serials, IN_CHUNK_SIZE):
+        for row in db.session.execute(select(*SCAN_COLUMNS).where(Asset.serial_number.in_(chunk))):
+            found[row.serial_number] = row
+    return found
+
+
+def _by_old_serial(serials):
+    # Latest move away from each serial; a serial freed by one move may have
+    # been given to another asset and moved away again later
+    asset_ids = {}
+    for chunk in batched(serials, IN_CHUNK_SIZE):
+        moves = db.session.execute(
+            select(AssetMovement.old_serial, AssetMovement.asset_id)
+            .where(AssetMovement.old_serial.in_(chunk), AssetMovement.old_serial != AssetMovement.new_serial)
+            .order_by(AssetMovement.movement_date, AssetMovement.id)
+        )
+        asset_ids.update((old_serial, asset_id) for old_serial, asset_id in moves)
+    rows = {}
+    for chunk in batched(sorted(set(asset_ids.values())), IN_CHUNK_SIZE):
+        rows.update((row.id, row) for row in db.session.execute(select(*SCAN_COLUMNS).where(Asset.id.in_(chunk))))
+    return {serial: rows[asset_id] for serial, asset_id in asset_ids.items() if asset_id in rows}
+
+
+def resolve_serials(serials):
+    """Map each scanned serial to ``(row, matched_old_serial)``; unknown serials are left out."""
+    serials = set(serials)
+    resolved = {serial: (row, False) for serial, row in _by_serial(serials).items()}
+    unresolved = serials - resolved.keys()
+    if unresolved:
+        resolved.update((serial, (row, True)) for serial, row in _by_old_serial(unresolved).items())
+    return resolved
+
+
+def resolve_serial(serial):
+    return resolve_serials([serial]).get(serial, (None, False))
+
+
+def stock_take(sublocation_id, serials):
+    """Compare the serials scanned in a sublocation with the assets recorded there.
+
+    Returns a dict with:
+
+    - ``found``: count of expected assets that were scanned
+    - ``missing``: expected assets that were not scanned
+    - ``misplaced``: scanned assets recorded in another sublocation
+    - ``relabel``: assets scanned by a serial from before a move
+    - ``disposed``: scanned assets recorded as disposed
+    - ``unexpected``: scanned serials that match no asset
+    - ``duplicates``: scans beyond the first of the same serial
+    """
+    ref = get_reference_data()
+    sublocation = ref.sublocation_by_id.get(sublocation_id)
+    if sublocation is None:
+        raise ValueError(f'Unknown sublocation {sublocation_id}')
+
+    serials = [serial.strip() for serial in serials if serial and serial.strip()]
+    scanned = set(serials)
+    expected = {
+        row.id: row for row in db.session.execute(
+            select(*SCAN_COLUMNS).where(Asset.sublocation_id == sublocation_id, Asset.status != 'Disposed'))
+    }
+    expected_serials = {row.serial_number for row in expected.values()}
+
+    # Scans of current serials recorded here need no lookup at all
+    resolved = resolve_serials(scanned - expected_serials)
+    seen_ids = {expected_row.id for expected_row in expected.values() if expected_row.serial_number in scanned}
+
+    misplaced, relabel, disposed = [], [], []
+    for serial, (row, matched_old_serial) in sorted(resolved.items()):
+        if matched_old_serial:
+            relabel.append({'scanned': serial, **scan_record(row, ref)})
+        if row.status == 'Disposed':
+            disposed.append(scan_record(row, ref))
+        elif row.sublocation_id != sublocation_id:
+            misplaced.append(scan_record(row, ref))
+        else:
+            seen_ids.add(row.id)
+
+    return {
+        'sublocation_id': sublocation_id,
+        'location_id': sublocation.location_id,
+        'scanned': len(serials),
+        'expected': len(expected),
+        'found': len(seen_ids & expected.keys()),
+        'missing': [scan_record(row, ref) for asset_id, row in sorted(expected.items()) if asset_id not in seen_ids],
+        'misplaced': misplaced,
+        'relabel': relabel,
+        'disposed': disposed,
+        'unexpected': sorted(scanned - expected_serials - resolved.keys()),
+        'duplicates': len(serials) - len(scanned),
+    }
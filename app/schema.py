@@ -0,0 +1,111 @@
+"""Bringing an existing database up to date with the models.
+
+``create_all`` only creates tables that are missing, so a column added to a
+table that already exists never reaches a database created before it, and
+the first query or index naming the column fails. Every such column is
+listed in ``ADDED_COLUMNS``, and ``upgrade_schema`` adds the ones a database
+lacks (``PRAGMA table_info`` on SQLite) with ``ALTER TABLE ... ADD COLUMN``,
+the one column change SQLite makes in place. The column is declared from
+its model, so it must be nullable or have a constant default; anything else
+raises ``SchemaError`` before any change is made, so a failed upgrade never
+leaves the database half done.
+
+Tables holding only derived data are dropped instead when their columns no
+longer match the model, and ``create_all`` recreates them: the serial
+counters reseed from the stored serials on the next registration.
+"""
+from sqlalchemy import inspect, literal
+
+from .models import db, ensure_indexes
+
+# (table, column) of every column added to a table that already existed,
+# oldest first. A column added to an existing model table goes here too.
+ADDED_COLUMNS = (
+    # Depreciation inputs
+    ('asset', 'purchase_cost'),
+    # Both sides of a movement
+    ('asset_movement', 'from_sublocation_id'),
+    ('asset_movement', 'to_sublocation_id'),
+    ('asset_movement', 'old_serial'),
+    ('asset_movement', 'new_serial'),
+    # Optimistic concurrency
+    ('asset', 'version'),
+)
+# Tables that may be dropped and recreated when their columns change
+DERIVED_TABLES = ('serial_sequence',)
+
+
+class SchemaError(RuntimeError):
+    pass
+
+
+def _existing_columns(inspector, table_name):
+    return {column['name'] for column in inspector.get_columns(table_name)}
+
+
+def pending_changes(engine):
+    """The ``(missing columns, stale derived tables)`` of the tables that already exist."""
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    columns = {}
+    missing = []
+    for table_name, column_name in ADDED_COLUMNS:
+        if table_name not in existing:
+            continue  # create_all builds the table with the column
+        if table_name not in columns:
+            columns[table_name] = _existing_columns(inspector, table_name)
+        if column_name not in columns[table_name]:
+            missing.append(db.metadata.tables[table_name].c[column_name])
+    stale = []
+    for table_name in DERIVED_TABLES:
+        table = db.metadata.tables[table_name]
+        if table_name in existing and _existing_columns(inspector, table_name) != set(table.columns.keys()):
+            stale.append(table)
+    return missing, stale
+
+
+def _column_ddl(engine, column):
+    quote = engine.dialect.identifier_preparer.quote
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is None and not column.nullable:
+        raise SchemaError(f'Cannot add {column.table.name}.{column.name}: it is NOT NULL without a constant '
+                          'default. Export the data and recreate the database.')
+    ddl = f'{quote(column.name)} {column.type.compile(engine.dialect)}'
+    if default is not None:
+        value = literal(default, column.type).compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+        ddl += f' NOT NULL DEFAULT {value}' if not column.nullable else f' DEFAULT {value}'
+    else:
+        # SQLite only accepts a foreign key on an added column whose default is NULL
+        for foreign_key in column.foreign_keys:
+            target = foreign_key.column
+            ddl += f' REFERENCES {quote(target.table.name)} ({quote(target.name)})'
+    return ddl
+
+
+def upgrade_schema(engine):
+    """Add the missing ``ADDED_COLUMNS`` and drop stale derived tables; returns the columns added."""
+    missing, stale = pending_changes(engine)
+    # Every statement is built first, so an impossible column changes nothing
+    statements = [f'ALTER TABLE {engine.dialect.identifier_preparer.quote(column.table.name)} '
+                  f'ADD COLUMN {_column_ddl(engine, column)}' for column in missing]
+    with engine.begin() as connection:
+        for table in stale:
+            table.drop(connection)
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+    return [f'{column.table.name}.{column.name}' for column in missing]
+
+
+def install_schema(engine):
+    """Create or upgrade every table, index, trigger and derived table."""
+    from .changes import seed_changes
+    from .rollups import seed_rollups
+    from .search import install_search
+
+    added = upgrade_schema(engine)
+    db.metadata.create_all(engine)
+    ensure_indexes(engine)
+    install_search(engine)
+    seed_rollups(engine)
+    seed_changes(engine)
+    return added
@@ -0,0 +1,159 @@
+"""Full-text asset search backed by an SQLite FTS5 table.
+
+``asset_search`` holds one row per asset, keyed by the asset id, with the
+asset's name, type, serial number and assignee plus the descriptions of its
+maintenance jobs. Triggers on ``asset`` and ``maintenance`` keep it in step
+with every write, including the executemany paths that bypass the ORM, so
+nothing in the application has to remember to update it. Matches are ranked
+with bm25, weighting serial and name hits above type, assignee and
+maintenance text.
+
+A query that looks like a serial prefix (``HQ-IT-``, ``HQ-IT-R1-00``) is
+answered from the unique index on ``asset.serial_number`` with a range scan
+instead: bm25 has to score every match before it can sort, which is slow when
+a prefix covers half the register, while the B-tree hands back the first page
+in serial order straight away. Other databases fall back to LIKE matching.
+"""
+import re
+
+from sqlalchemy import column, false, func, literal_column, or_, select, table, text
+
+from .models import db, Asset
+
+FTS_TABLE = 'asset_search'
+FTS_COLUMNS = ('name', 'type', 'serial_number', 'assigned_to', 'maintenance')
+# bm25 column weights, in FTS_COLUMNS order
+FTS_WEIGHTS = (10.0, 4.0, 20.0, 5.0, 1.0)
+
+SERIAL_PREFIX = re.compile(r'^[A-Za-z0-9]+-[A-Za-z0-9-]*$')
+TERM = re.compile(r'\w+')
+
+# Lightweight handle for joining against the FTS table, which has no model
+search_table = table(FTS_TABLE, column('rowid'))
+
+_MAINTENANCE_TEXT = "(SELECT group_concat(description, ' ') FROM maintenance WHERE asset_id = {asset_id})"
+
+FTS_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {', '.join(FTS_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS asset_search_ai AFTER INSERT ON asset BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)})
+        VALUES (new.id, new.name, new.type, new.serial_number, new.assigned_to,
+                {_MAINTENANCE_TEXT.format(asset_id='new.id')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS asset_search_au
+        AFTER UPDATE OF name, type, serial_number, assigned_to ON asset BEGIN
+        UPDATE {FTS_TABLE} SET name = new.name, type = new.type, serial_number = new.serial_number,
+            assigned_to = new.assigned_to
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS asset_search_ad AFTER DELETE ON asset BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS asset_search_mi AFTER INSERT ON maintenance BEGIN
+        UPDATE {FTS_TABLE} SET maintenance = {_MAINTENANCE_TEXT.format(asset_id='new.asset_id')}
+        WHERE rowid = new.asset_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS asset_search_mu AFTER UPDATE OF asset_id, description ON maintenance BEGIN
+        UPDATE {FTS_TABLE} SET maintenance = {_MAINTENANCE_TEXT.format(asset_id='old.asset_id')}
+        WHERE rowid = old.asset_id;
+        UPDATE {FTS_TABLE} SET maintenance = {_MAINTENANCE_TEXT.format(asset_id='new.asset_id')}
+        WHERE rowid = new.asset_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS asset_search_md AFTER DELETE ON maintenance BEGIN
+        UPDATE {FTS_TABLE} SET maintenance = {_MAINTENANCE_TEXT.format(asset_id='old.asset_id')}
+        WHERE rowid = old.asset_id;
+    END""",
+)
+
+
+def search_supported(engine):
+    return engine.dialect.name == 'sqlite'
+
+
+def install_search(engine):
+    """Create the FTS table and its triggers if missing; fill the table when it is new."""
+    if not search_supported(engine):
+        return
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+        ).first()
+        for statement in FTS_DDL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            _fill(connection)
+
+
+def drop_search(engine):
+    if not search_supported(engine):
+        return
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _fill(connection):
+    connection.exec_driver_sql(
+        f"""INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)})
+        SELECT asset.id, asset.name, asset.type, asset.serial_number, asset.assigned_to, m.text
+        FROM asset LEFT JOIN (
+            SELECT asset_id, group_concat(description, ' ') AS text FROM maintenance GROUP BY asset_id
+        ) AS m ON m.asset_id = asset.id"""
+    )
+
+
+def rebuild_search_index():
+    """Repopulate ``asset_search`` from scratch and merge its b-trees; returns the row count."""
+    install_search(db.engine)
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(f'DELETE FROM {FTS_TABLE}')
+        _fill(connection)
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return connection.exec_driver_sql(f'SELECT count(*) FROM {FTS_TABLE}').scalar()
+
+
+def fts_query(q):
+    """Turn free text into an FTS5 query: every word must match, each as a prefix."""
+    return ' '.join(f'"{term}"*' for term in TERM.findall(q))
+
+
+def _serial_prefix_clause(q):
+    # Serials are case-sensitive in the index; try the text as typed and upper-cased
+    return or_(*(Asset.serial_number.between(prefix, prefix + '\uffff') for prefix in {q, q.upper()}))
+
+
+def search_assets(q, limit, offset=0):
+    """Return (mode, statement) for one page of assets matching ``q``.
+
+    ``mode`` is ``'serial'`` for the serial-prefix range scan, ``'fts'`` for
+    ranked full-text matches and ``'like'`` off SQLite. The statement selects
+    ``Asset`` entities; callers add loader options.
+    """
+    q = q.strip()
+    if SERIAL_PREFIX.match(q):
+        clause = _serial_prefix_clause(q)
+        if db.session.execute(select(Asset.id).where(clause).limit(1)).first() is not None:
+            return 'serial', select(Asset).where(clause).order_by(Asset.serial_number).limit(limit).offset(offset)
+
+    if not search_supported(db.engine):
+        terms = TERM.findall(q)
+        stmt = select(Asset)
+        for term in terms:
+            pattern = f'%{term}%'
+            stmt = stmt.where(or_(Asset.name.ilike(pattern), Asset.type.ilike(pattern),
+                                  Asset.serial_number.ilike(pattern), Asset.assigned_to.ilike(pattern)))
+        return 'like', stmt.order_by(Asset.id).limit(limit).offset(offset)
+
+    match = fts_query(q)
+    if not match:
+        return 'fts', select(Asset).where(false())
+    fts = literal_column(FTS_TABLE)
+    stmt = (
+        select(Asset)
+        .join(search_table, Asset.id == search_table.c.rowid)
+        .where(fts.op('MATCH')(match))
+        .order_by(func.bm25(fts, *FTS_WEIGHTS))
+        .limit(limit)
+        .offset(offset)
+    )
+    return 'fts', stmt
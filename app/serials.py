@@ -0,0 +1,70 @@
+"""Serial number allocation.
+
+Serials look like ``<location>-<category>-<sublocation>-<suffix>``. The suffix
+comes from a per-category counter in ``SerialSequence`` that is incremented with a single ``UPDATE ... RETURNING`` inside the caller's
+transaction. The row lock that UPDATE takes makes concurrent writers, in any
+process, queue behind each other instead of computing the same suffix. If the
+transaction rolls back, the increment is undone as well. Gaps are harmless.
+
+The serial carries no subcategory code, so the category is the scope it has
+to be unique in. A move keeps the suffix and only swaps the location and
+sublocation codes, so a suffix handed out once is never handed out again
+within its category and every allocated serial is free.
+"""
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .metrics import SERIAL_ALLOCATION_SECONDS
+from .models import db, Asset, SerialSequence
+
+
+def format_serial(location_code, category_code, sublocation_code, suffix):
+    if isinstance(suffix, int):
+        suffix = str(suffix).zfill(3)
+    return f"{location_code}-{category_code}-{sublocation_code}-{suffix}"
+
+
+def serial_suffix(serial_number):
+    # Keep the same sequential number (last part of serial number)
+    return serial_number.split('-')[-1] or "001"
+
+
+def allocate_serial_suffixes(category_id, count=1):
+    """Reserve ``count`` consecutive suffixes in ``category_id`` and return the first one."""
+    with SERIAL_ALLOCATION_SECONDS.time():
+        return _allocate(category_id, count)
+
+
+def _highest_suffix(category_id):
+    # Serials registered before the sequence existed, however they were numbered
+    highest = 0
+    for serial in db.session.execute(select(Asset.serial_number).where(Asset.category_id == category_id)).scalars():
+        suffix = serial_suffix(serial)
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def _allocate(category_id, count):
+    table = SerialSequence.__table__
+    bump = (
+        update(table)
+        .where(table.c.category_id == category_id)
+        .values(last_value=table.c.last_value + count)
+        .returning(table.c.last_value)
+    )
+    last_value = db.session.execute(bump).scalar()
+
+    if last_value is None:
+        # First allocation in this category: start above every suffix already
+        # in use (one indexed read of the category's serials, once)
+        existing = _highest_suffix(category_id)
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(category_id=category_id, last_value=existing + count))
+            last_value = existing + count
+        except IntegrityError:
+            # Another writer created the row first
+            last_value = db.session.execute(bump).scalar()
+
+    return last_value - count + 1
@@ -0,0 +1,92 @@
+"""Drawing label sheets; the code the barcode pool processes run.
+
+Kept apart from ``labels`` so a pool process imports only this module and
+the libraries it draws with, not the models and the database layer.
+"""
+import io
+import os
+import zlib
+from collections import namedtuple
+
+# All sizes in millimetres; pitch is the distance from one label's edge to the next one's
+LabelLayout = namedtuple('LabelLayout', 'page_width page_height columns rows label_width label_height '
+                                        'left top pitch_x pitch_y')
+
+LAYOUTS = {
+    # Avery L7160 and compatibles
+    'a4-21': LabelLayout(210, 297, 3, 7, 63.5, 38.1, 7.25, 15.15, 66.04, 38.1),
+    # Avery 5160 and compatibles
+    'letter-30': LabelLayout(215.9, 279.4, 3, 10, 66.675, 25.4, 4.7625, 12.7, 69.85, 25.4),
+}
+
+# Blank space kept inside each label edge, in millimetres
+LABEL_PADDING = 2.0
+QUIET_ZONE_MODULES = 10
+
+
+def _fit(draw, text, font, width):
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def render_sheet(labels, layout_name, dpi, fmt):
+    """Draw one sheet of ``(serial, name)`` labels; returns PNG bytes or a Flate-compressed 1-bit bitmap.
+
+    Runs in a pool process.
+    """
+    import barcode
+    from barcode import Code128
+    from PIL import Image, ImageDraw, ImageFont
+
+    layout = LAYOUTS[layout_name]
+
+    def px(mm):
+        return int(round(mm * dpi / 25.4))
+
+    font_path = os.path.join(os.path.dirname(barcode.__file__), 'fonts', 'DejaVuSansMono.ttf')
+    name_font = ImageFont.truetype(font_path, max(8, int(layout.label_height * dpi / 25.4 * 0.13)))
+    serial_font = ImageFont.truetype(font_path, max(8, int(layout.label_height * dpi / 25.4 * 0.15)))
+
+    sheet = Image.new('1', (px(layout.page_width), px(layout.page_height)), 1)
+    draw = ImageDraw.Draw(sheet)
+    padding = px(LABEL_PADDING)
+    width = px(layout.label_width) - 2 * padding
+    height = px(layout.label_height) - 2 * padding
+    name_height = name_font.getbbox('Ag')[3]
+    serial_height = serial_font.getbbox('Ag')[3]
+    bar_height = height - name_height - serial_height - 2 * padding
+
+    for index, (serial, name) in enumerate(labels):
+        row, column = divmod(index, layout.columns)
+        x = px(layout.left + column * layout.pitch_x) + padding
+        y = px(layout.top + row * layout.pitch_y) + padding
+
+        draw.text((x, y), _fit(draw, name or '', name_font, width), font=name_font, fill=0)
+
+        # Whole pixels per module so every bar of the same width prints the
+        # same; ten modules of quiet zone are kept clear on each side
+        modules = Code128(serial).build()[0]
+        module = max(1, width // (len(modules) + 2 * QUIET_ZONE_MODULES))
+        left = x + (width - module * len(modules)) // 2
+        top = y + name_height + padding
+        start = None
+        for i, bit in enumerate(modules + '0'):
+            if bit == '1' and start is None:
+                start = i
+            elif bit == '0' and start is not None:
+                draw.rectangle((left + start * module, top, left + i * module - 1, top + bar_height - 1), fill=0)
+                start = None
+
+        serial_width = draw.textlength(serial, font=serial_font)
+        draw.text((x + max(0, (width - serial_width) // 2), top + bar_height + padding), serial,
+                  font=serial_font, fill=0)
+
+    if fmt == 'png':
+        buffer = io.BytesIO()
+        sheet.save(buffer, 'PNG', dpi=(dpi, dpi))
+        return buffer.getvalue()
+    # PIL packs '1' rows MSB first and pads them to a byte, as PDF expects
+    return zlib.compress(sheet.tobytes())
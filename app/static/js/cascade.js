@@ -0,0 +1,31 @@
+// Cascading selects. A <select data-cascade-from="location" data-cascade-key="sublocations">
+// is refilled whenever its parent select changes, from the JSON list at the
+// data-children-url of the parent's selected option. Options with an empty
+// value ("All", "Select ...") are kept.
+document.querySelectorAll('select[data-cascade-from]').forEach(function (child) {
+    var parent = document.getElementById(child.dataset.cascadeFrom);
+    parent.addEventListener('change', function () {
+        var option = parent.options[parent.selectedIndex];
+        var url = option && option.dataset.childrenUrl;
+        var selected = parent.value;
+        Array.from(child.options).forEach(function (existing) {
+            if (existing.value !== '') {
+                existing.remove();
+            }
+        });
+        if (!url) {
+            return;
+        }
+        fetch(url).then(function (response) {
+            return response.json();
+        }).then(function (data) {
+            // Ignore a late answer for a parent that is no longer selected
+            if (parent.value !== selected) {
+                return;
+            }
+            data[child.dataset.cascadeKey].forEach(function (item) {
+                child.add(new Option(item.name + ' (' + item.code + ')', item.id));
+            });
+        });
+    });
+});
@@ -1,44 +1,63 @@
-from flask import render_template, request, redirect, url_for, flash, current_app
-from . import app
-from .models import db, Asset, Location, SubLocation, Category, SubCategory, AssetMovement, Maintenance, Disposal
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort, stream_with_context, jsonify
+from .models import db, Asset, Maintenance
+from .refdata import get_reference_data
+from .changes import change_to_dict, changes_since
+from .database import IN_CHUNK_SIZE, batched
+from .labels import LAYOUTS, SHEET_MIMETYPES, iter_label_sheets, label_rows, sheets_in_flight
+from .importer import ASSET_CSV_COLUMNS, OPTIONAL_ASSET_CSV_COLUMNS, import_assets
+from .depreciation import compute_snapshot, snapshot_dates, snapshot_totals
+from .exporter import EXPORTERS, EXPORT_MIMETYPES
+from .maintenance import MaintenanceConflict, calendar, close_window, is_overdue, open_ended, schedule_window
+from .movements import asset_timeline, location_as_of, move_assets, movements_between, occupancy_as_of
+from .rollups import facet_counts, totals_by
+from .scans import resolve_serial, scan_record, stock_take
+from .search import search_assets
+from .serials import allocate_serial_suffixes, format_serial
+from .queries import asset_filters_from_args, filter_assets, with_reference_data, keyset_page
 from sqlalchemy.exc import IntegrityError
-import os
-from datetime import date
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import date, timedelta
 
-from barcode import Code128
-from barcode.writer import ImageWriter
+from . import metrics
+from .barcodes import MIMETYPES, barcode_etag, get_cache, get_pool, render_barcode
 
-# Modify the default route to redirect to 'list_assets'
-@app.route('/')
+main = Blueprint('main', __name__)
+
+EDIT_CONFLICT = 'This asset was changed by someone else after you opened it. Review the current values and try again.'
+
+@main.route('/')
 def home():
-    return redirect(url_for('list_assets'))
+    # Counts come from the rollup table, not a GROUP BY over every asset
+    totals = {column: dict(totals_by(column)) for column in ('status', 'location_id', 'category_id')}
+    return render_template('dashboard.html', totals=totals, total=sum(totals['status'].values()),
+                           **get_reference_data().template_context())
 
-@app.route('/locations', methods=['GET', 'POST'])
+@main.route('/locations', methods=['GET', 'POST'])
 def manage_locations():
     if request.method == 'POST':
         # Add new location
         pass
-    locations = Location.query.all()
+    locations = get_reference_data().locations
     return render_template('locations.html', locations=locations)
 
-@app.route('/categories', methods=['GET', 'POST'])
+@main.route('/categories', methods=['GET', 'POST'])
 def manage_categories():
     if request.method == 'POST':
         # Add new category
         pass
-    categories = Category.query.all()
+    categories = get_reference_data().categories
     return render_template('categories.html', categories=categories)
 
-@app.route('/subcategories', methods=['GET', 'POST'])
+@main.route('/subcategories', methods=['GET', 'POST'])
 def manage_subcategories():
     if request.method == 'POST':
         # Add new subcategory
         pass
-    subcategories = SubCategory.query.all()
+    subcategories = get_reference_data().subcategories
     return render_template('subcategories.html', subcategories=subcategories)
 
 # Enhance asset registration
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register_asset():
     if request.method == 'POST':
         try:
@@ -50,47 +69,34 @@ def register_asset():
             sublocation_id = int(request.form['sublocation'])
             status = request.form['status']
             depreciation = float(request.form['depreciation'])
+            purchase_cost = float(request.form.get('purchase_cost') or 0)
             purchased_on = date.fromisoformat(request.form['purchased_on'])
 
             # Generate Serial Number
-            location_obj = Location.query.get(location_id)
-            category_obj = Category.query.get(category_id)
-            sublocation_obj = SubLocation.query.get(sublocation_id)
+            ref = get_reference_data()
+            location_obj = ref.location_by_id.get(location_id)
+            category_obj = ref.category_by_id.get(category_id)
+            sublocation_obj = ref.sublocation_by_id.get(sublocation_id)
+            subcategory_obj = ref.subcategory_by_id.get(subcategory_id)
             
-            if not location_obj or not category_obj or not sublocation_obj:
-                flash('Invalid location, category, or sublocation selected!')
-                categories = Category.query.all()
-                subcategories = SubCategory.query.all()
-                locations = Location.query.all()
-                sublocations = SubLocation.query.all()
-                return render_template('register_asset.html', categories=categories, subcategories=subcategories, locations=locations, sublocations=sublocations)
+            if not location_obj or not category_obj or not sublocation_obj or not subcategory_obj:
+                flash('Invalid location, category, sublocation or subcategory selected!', 'error')
+                return render_template('register_asset.html', **ref.template_context())
+            # The selects only offer matching children, but a stale or hand-made
+            # form can still pair a child with another parent
+            if sublocation_obj.location_id != location_id:
+                flash(f'{sublocation_obj.name} is not in {location_obj.name}!', 'error')
+                return render_template('register_asset.html', **ref.template_context())
+            if subcategory_obj.category_id != category_id:
+                flash(f'{subcategory_obj.name} is not a subcategory of {category_obj.name}!', 'error')
+                return render_template('register_asset.html', **ref.template_context())
             
             location_code = location_obj.code
             category_code = category_obj.code
             sublocation_code = sublocation_obj.code
             
-            existing_assets = Asset.query.filter_by(
-                category_id=category_id,
-                subcategory_id=subcategory_id
-            ).count()
-            serial_suffix = str(existing_assets + 1).zfill(3)
-            serial_number = f"{location_code}-{category_code}-{sublocation_code}-{serial_suffix}"
-
-            # Generate Barcode
-            try:
-                # Get the directory where this file is located
-                app_dir = os.path.dirname(os.path.abspath(__file__))
-                barcode_dir = os.path.join(app_dir, 'static', 'barcodes')
-                os.makedirs(barcode_dir, exist_ok=True)
-                # Save without extension - the library will add it
-                barcode_path = os.path.join(barcode_dir, serial_number)
-                code128 = Code128(serial_number, writer=ImageWriter())
-                code128.save(barcode_path)
-            except Exception as barcode_error:
-                # Log barcode error but don't fail asset creation
-                print(f"Barcode generation error: {str(barcode_error)}")
-                # Continue without barcode for now
-                pass
+            suffix = allocate_serial_suffixes(category_id)
+            serial_number = format_serial(location_code, category_code, sublocation_code, suffix)
 
             # Create new Asset
             new_asset = Asset(
@@ -103,12 +109,13 @@ def register_asset():
                 status=status,
                 depreciation=depreciation,
                 purchased_on=purchased_on,
+                purchase_cost=purchase_cost,
                 serial_number=serial_number
             )
             db.session.add(new_asset)
             db.session.commit()
             flash('Asset registered successfully!', 'success')
-            return redirect(url_for('list_assets'))
+            return redirect(url_for('main.list_assets'))
         except IntegrityError:
             db.session.rollback()
             flash('Asset with the same serial number exists!', 'error')
@@ -116,23 +123,39 @@ def register_asset():
             db.session.rollback()
             flash(f'Error creating asset: {str(e)}', 'error')
 
-    categories = Category.query.all()
-    subcategories = SubCategory.query.all()
-    locations = Location.query.all()
-    sublocations = SubLocation.query.all()
-    return render_template('register_asset.html', categories=categories, subcategories=subcategories, locations=locations, sublocations=sublocations)
+    return render_template('register_asset.html', **get_reference_data().template_context())
+
+@main.route('/assets/import', methods=['GET', 'POST'])
+def import_assets_upload():
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a CSV file to import.', 'error')
+        else:
+            # Read the upload line by line rather than loading it whole; the
+            # importer decodes each line, so a bad byte rejects only its row
+            report = import_assets(upload.stream, batch_size=current_app.config['IMPORT_BATCH_SIZE'])
+            flash(f'Imported {report.inserted} assets.', 'success' if not report.errors else 'error')
+    return render_template('import_assets.html', report=report, columns=ASSET_CSV_COLUMNS + OPTIONAL_ASSET_CSV_COLUMNS)
 
-@app.route('/assets/<int:asset_id>', methods=['GET'])
+@main.route('/assets/<int:asset_id>', methods=['GET'])
 def asset_detail(asset_id):
     asset = Asset.query.get_or_404(asset_id)
-    locations = Location.query.all()
-    sublocations = SubLocation.query.all()
-    return render_template('asset_detail.html', asset=asset, locations=locations, sublocations=sublocations)
+    ref = get_reference_data()
+    return render_template('asset_detail.html', asset=asset, locations=ref.locations,
+                           sublocations=ref.sublocations_by_location.get(asset.location_id, ()), movements=asset_timeline(asset_id), location_by_id=ref.location_by_id,
+                           sublocation_by_id=ref.sublocation_by_id)
 
-@app.route('/edit_asset/<int:asset_id>', methods=['GET', 'POST'])
+@main.route('/edit_asset/<int:asset_id>', methods=['GET', 'POST'])
 def edit_asset(asset_id):
     asset = Asset.query.get_or_404(asset_id)
     if request.method == 'POST':
+        # The form carries the version it was rendered from; saving it over a
+        # newer one would silently undo someone else's change
+        if request.form.get('version', type=int) != asset.version:
+            flash(EDIT_CONFLICT, 'error')
+            return redirect(url_for('main.edit_asset', asset_id=asset_id))
         asset.name = request.form['name']
         asset.type = request.form['type']
         asset.status = request.form['status']
@@ -140,124 +163,328 @@ def edit_asset(asset_id):
         try:
             db.session.commit()
             flash('Asset updated successfully!', 'success')
-            return redirect(url_for('list_assets'))
+            return redirect(url_for('main.list_assets'))
+        except StaleDataError:
+            # Changed between the check above and the UPDATE
+            db.session.rollback()
+            flash(EDIT_CONFLICT, 'error')
+            return redirect(url_for('main.edit_asset', asset_id=asset_id))
         except Exception as e:
             db.session.rollback()
             flash(f'Error updating asset: {str(e)}', 'error')
 
-    categories = Category.query.all()
-    subcategories = SubCategory.query.all()
-    locations = Location.query.all()
-    sublocations = SubLocation.query.all()
-    return render_template('edit_asset.html', asset=asset, categories=categories, subcategories=subcategories, locations=locations, sublocations=sublocations)
+    return render_template('edit_asset.html', asset=asset)
 
-@app.route('/assets', methods=['GET'])
+@main.route('/assets', methods=['GET'])
 def list_assets():
-    status_filter = request.args.get('status')
-    location_filter = request.args.get('location')
-    sublocation_filter = request.args.get('sublocation')
-    category_filter = request.args.get('category')
-    subcategory_filter = request.args.get('subcategory')
-
-    query = Asset.query
-
-    if status_filter:
-        query = query.filter_by(status=status_filter)
-    if location_filter:
-        query = query.filter_by(location_id=location_filter)
-    if sublocation_filter:
-        query = query.filter_by(sublocation_id=sublocation_filter)
-    if category_filter:
-        query = query.filter_by(category_id=category_filter)
-    if subcategory_filter:
-        query = query.filter_by(subcategory_id=subcategory_filter)
-
-    assets = query.all()
-    categories = Category.query.all()
-    subcategories = SubCategory.query.all()
-    locations = Location.query.all()
-    sublocations = SubLocation.query.all()
-
-    return render_template('assets_list.html', assets=assets, categories=categories, subcategories=subcategories, locations=locations, sublocations=sublocations)
-
-@app.route('/move_asset/<int:asset_id>', methods=['POST'])
+    filters = asset_filters_from_args(request.args)
+    per_page = request.args.get('per_page', type=int) or current_app.config['ASSETS_PER_PAGE']
+    per_page = max(1, min(per_page, current_app.config['MAX_ASSETS_PER_PAGE']))
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+
+    query = with_reference_data(filter_assets(Asset.query, filters))
+    assets, prev_cursor, next_cursor = keyset_page(query, per_page, after=after, before=before)
+
+    # Cursor links keep the active filters and page size
+    page_args = dict(filters)
+    if 'per_page' in request.args:
+        page_args['per_page'] = per_page
+    prev_url = url_for('main.list_assets', before=prev_cursor, **page_args) if prev_cursor else None
+    next_url = url_for('main.list_assets', after=next_cursor, **page_args) if next_cursor else None
+
+    # Only the children of the selected (or the selected child's) parent are listed
+    ref = get_reference_data()
+    sublocation = ref.sublocation_by_id.get(_int_or_none(filters.get('sublocation')))
+    subcategory = ref.subcategory_by_id.get(_int_or_none(filters.get('subcategory')))
+    context = ref.template_context(
+        location_id=_int_or_none(filters.get('location')) or (sublocation and sublocation.location_id),
+        category_id=_int_or_none(filters.get('category')) or (subcategory and subcategory.category_id))
+    return render_template('assets_list.html', assets=assets, prev_url=prev_url, next_url=next_url, filters=filters,
+                           facets=facet_counts(filters), **context)
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _search_page():
+    q = request.args.get('q', '').strip()
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+    offset = max(0, request.args.get('offset', 0, type=int))
+    if not q:
+        return q, None, [], offset, False
+    # Fetch one extra row to know whether there is a next page
+    mode, stmt = search_assets(q, per_page + 1, offset)
+    assets = db.session.execute(with_reference_data(stmt)).unique().scalars().all()
+    return q, mode, assets[:per_page], offset, len(assets) > per_page
+
+@main.route('/assets/search', methods=['GET'])
+def search_assets_page():
+    q, mode, assets, offset, has_next = _search_page()
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+    prev_url = url_for('main.search_assets_page', q=q, offset=max(0, offset - per_page)) if offset else None
+    next_url = url_for('main.search_assets_page', q=q, offset=offset + per_page) if has_next else None
+    return render_template('search_results.html', q=q, mode=mode, assets=assets, prev_url=prev_url, next_url=next_url)
+
+@main.route('/api/assets/search', methods=['GET'])
+def search_assets_api():
+    q, mode, assets, offset, has_next = _search_page()
+    return jsonify(q=q, mode=mode, offset=offset, has_next=has_next, results=[{
+        'id': asset.id,
+        'serial_number': asset.serial_number,
+        'name': asset.name,
+        'type': asset.type,
+        'status': asset.status,
+        'assigned_to': asset.assigned_to,
+        'location_code': asset.location.code,
+        'sublocation_code': asset.sub_location.code,
+        'url': url_for('main.asset_detail', asset_id=asset.id),
+    } for asset in assets])
+
+@main.route('/assets/export.<any(csv, ndjson):fmt>', methods=['GET'])
+def export_assets(fmt):
+    filters = asset_filters_from_args(request.args)
+    rows = EXPORTERS[fmt](filters, current_app.config['EXPORT_BATCH_SIZE'])
+    response = current_app.response_class(stream_with_context(rows), mimetype=EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=assets.{fmt}'
+    return response
+
+@main.route('/assets/labels.<any(pdf, zip):fmt>', methods=['GET'])
+def label_sheets(fmt):
+    # Same filters as the asset list, or an explicit ids=1,2,3
+    layout = request.args.get('layout') or current_app.config['LABEL_LAYOUT']
+    if layout not in LAYOUTS:
+        abort(400, description=f"Unknown layout; choose from {', '.join(LAYOUTS)}")
+    max_assets = current_app.config['LABEL_MAX_ASSETS']
+    try:
+        asset_ids = [int(value) for value in request.args['ids'].split(',') if value.strip()] if request.args.get('ids') else None
+    except ValueError:
+        abort(400, description='ids must be a comma-separated list of asset ids')
+    if asset_ids is not None and len(asset_ids) > max_assets:
+        abort(400, description=f'At most {max_assets} labels can be printed at once')
+
+    labels = label_rows(asset_filters_from_args(request.args), asset_ids, limit=max_assets + 1)
+    if not labels:
+        abort(404, description='No assets match')
+    if len(labels) > max_assets:
+        abort(400, description=f'At most {max_assets} labels can be printed at once; narrow the filters')
+
+    # Sheets are rendered by the barcode pool and sent as each one is done;
+    # the generator needs no database access, so no request context is kept
+    pool = get_pool()
+    sheets = iter_label_sheets(labels, fmt, pool.executor, layout, current_app.config['LABEL_DPI'],
+                               sheets_in_flight(current_app, pool))
+    response = current_app.response_class(sheets, mimetype=SHEET_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=labels.{fmt}'
+    return response
+
+@main.route('/move_asset/<int:asset_id>', methods=['POST'])
 def move_asset(asset_id):
-    asset = Asset.query.get_or_404(asset_id)
     new_location_id = int(request.form['new_location'])
     new_sublocation_id = int(request.form['new_sublocation'])
-    
-    old_location_id = asset.location_id
-    location_changed = old_location_id != new_location_id
-
-    if asset.location_id != new_location_id or asset.sublocation_id != new_sublocation_id:
-        # Record movement
-        movement = AssetMovement(
-            asset_id=asset.id,
-            from_location_id=asset.location_id,
-            to_location_id=new_location_id,
-            movement_date=date.today()
-        )
-        db.session.add(movement)
-        
-        # Update location and sublocation
-        asset.location_id = new_location_id
-        asset.sublocation_id = new_sublocation_id
-        
-        # If location changed, update serial number and regenerate barcode
-        if location_changed:
-            try:
-                # Save old serial number for barcode deletion
-                old_serial_number = asset.serial_number
-                
-                # Get the new location, category, and sublocation codes
-                location_obj = Location.query.get(new_location_id)
-                category_obj = Category.query.get(asset.category_id)
-                sublocation_obj = SubLocation.query.get(new_sublocation_id)
-                
-                location_code = location_obj.code
-                category_code = category_obj.code
-                sublocation_code = sublocation_obj.code
-                
-                # Keep the same sequential number (last part of serial number)
-                # Extract the current sequential number from existing serial
-                old_serial_parts = old_serial_number.split('-')
-                serial_suffix = old_serial_parts[-1] if len(old_serial_parts) > 0 else "001"
-                
-                # Generate new serial number with new location code
-                new_serial_number = f"{location_code}-{category_code}-{sublocation_code}-{serial_suffix}"
-                
-                # Update serial number
-                asset.serial_number = new_serial_number
-                
-                # Regenerate barcode
-                app_dir = os.path.dirname(os.path.abspath(__file__))
-                barcode_dir = os.path.join(app_dir, 'static', 'barcodes')
-                os.makedirs(barcode_dir, exist_ok=True)
-                
-                # Remove old barcode if exists
-                old_barcode_path = os.path.join(barcode_dir, f'{old_serial_number}.png')
-                if os.path.exists(old_barcode_path):
-                    os.remove(old_barcode_path)
-                
-                # Generate new barcode
-                barcode_path = os.path.join(barcode_dir, new_serial_number)
-                code128 = Code128(new_serial_number, writer=ImageWriter())
-                code128.save(barcode_path)
-                
-            except Exception as barcode_error:
-                print(f"Barcode generation error: {str(barcode_error)}")
-                # Continue without barcode update for now
-        
+
+    try:
+        ok, results = move_assets(new_location_id, new_sublocation_id, asset_ids=[asset_id])
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('main.asset_detail', asset_id=asset_id))
+    except StaleDataError:
+        db.session.rollback()
+        flash(EDIT_CONFLICT, 'error')
+        return redirect(url_for('main.asset_detail', asset_id=asset_id))
+
+    result = results[0]
+    if result.asset_id is None:
+        abort(404)
+    if not ok:
+        db.session.rollback()
+        flash(result.error, 'error')
+    elif result.status == 'moved':
         db.session.commit()
         flash('Asset moved successfully!', 'success')
-        if location_changed:
+        if result.new_serial_number:
             flash('Serial number and barcode updated due to location change.', 'info')
     else:
         flash('No changes detected.', 'info')
 
-    return redirect(url_for('asset_detail', asset_id=asset_id))
+    return redirect(url_for('main.asset_detail', asset_id=asset_id))
+
+@main.route('/api/assets/bulk_move', methods=['POST'])
+def bulk_move_assets():
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify(error='The request body must be a JSON object'), 400
+    asset_ids = payload.get('asset_ids')
+    serials = payload.get('serials')
+    try:
+        location_id = int(payload['location_id'])
+        sublocation_id = int(payload['sublocation_id'])
+        if (asset_ids is None) == (serials is None):
+            raise ValueError('Provide either asset_ids or serials')
+        # Checked rather than converted: int() and str() would take "123" or
+        # iterate a string one character at a time
+        if asset_ids is not None and (not isinstance(asset_ids, list) or not all(
+                isinstance(key, int) and not isinstance(key, bool) for key in asset_ids)):
+            raise ValueError('asset_ids must be a list of integers')
+        if serials is not None and (not isinstance(serials, list) or not all(isinstance(key, str) for key in serials)):
+            raise ValueError('serials must be a list of strings')
+        keys = asset_ids if asset_ids is not None else serials
+        if len(keys) > current_app.config['BULK_MOVE_MAX_ASSETS']:
+            raise ValueError(f"At most {current_app.config['BULK_MOVE_MAX_ASSETS']} assets can be moved at once")
+        ok, results = move_assets(location_id, sublocation_id,
+                                  asset_ids=keys if asset_ids is not None else None,
+                                  serials=keys if serials is not None else None)
+    except KeyError as e:
+        return jsonify(error=f'Missing {e.args[0]}'), 400
+    except (TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify(ok=False, error='Some of the assets changed while they were being moved; nothing was moved'), 409
+
+    if ok:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    counts = {status: sum(1 for result in results if result.status == status) for status in ('moved', 'unchanged', 'skipped', 'error')}
+    return jsonify(ok=ok, **counts, results=[result.to_dict() for result in results]), 200 if ok else 409
+
+@main.route('/api/scan/<serial>', methods=['GET'])
+def scan_serial(serial):
+    row, matched_old_serial = resolve_serial(serial.strip())
+    if row is None:
+        return jsonify(error=f'No asset with serial {serial}'), 404
+    return jsonify(scanned=serial, matched='old_serial' if matched_old_serial else 'serial',
+                   asset=scan_record(row), url=url_for('main.asset_detail', asset_id=row.id))
+
+@main.route('/api/stocktake', methods=['POST'])
+def stocktake():
+    payload = request.get_json(silent=True) or {}
+    try:
+        sublocation_id = int(payload['sublocation_id'])
+        serials = payload['serials']
+        if not isinstance(serials, list) or not all(isinstance(serial, str) for serial in serials):
+            raise ValueError('serials must be a list of strings')
+        if len(serials) > current_app.config['STOCKTAKE_MAX_SERIALS']:
+            raise ValueError(f"At most {current_app.config['STOCKTAKE_MAX_SERIALS']} serials per stock-take")
+        return jsonify(stock_take(sublocation_id, serials))
+    except KeyError as e:
+        return jsonify(error=f'Missing {e.args[0]}'), 400
+    except (TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+
+@main.route('/changes', methods=['GET'])
+def change_feed():
+    # Consumers pass back next_since to read on from where they stopped
+    since = request.args.get('since', type=int) if 'since' in request.args else 0
+    if since is None or since < 0:
+        return jsonify(error='since must be a sequence number'), 400
+    limit = request.args.get('limit', type=int) or current_app.config['CHANGES_PER_PAGE']
+    limit = max(1, min(limit, current_app.config['MAX_CHANGES_PER_PAGE']))
+    # Fetch one extra entry to know whether there is more to read
+    changes = changes_since(since, limit + 1)
+    page = changes[:limit]
+    return jsonify(changes=[change_to_dict(change) for change in page],
+                   next_since=page[-1].seq if page else since, has_more=len(changes) > limit)
+
+def _reference_json(ref, **payload):
+    response = jsonify(**payload)
+    # Reference rows only change together with the version, so it validates
+    # every child list; browsers reuse a list for REFDATA_HTTP_MAX_AGE and
+    # then revalidate it for a 304
+    response.set_etag(f'refdata-{ref.version}')
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['REFDATA_HTTP_MAX_AGE']
+    return response.make_conditional(request)
 
-@app.route('/schedule_maintenance', methods=['POST'])
+def _child_to_dict(row):
+    return {'id': row.id, 'name': row.name, 'code': row.code}
+
+@main.route('/api/locations/<int:location_id>/sublocations', methods=['GET'])
+def location_sublocations(location_id):
+    ref = get_reference_data()
+    if location_id not in ref.location_by_id:
+        return jsonify(error=f'No location {location_id}'), 404
+    return _reference_json(ref, location_id=location_id, sublocations=[
+        _child_to_dict(row) for row in ref.sublocations_by_location.get(location_id, ())])
+
+@main.route('/api/categories/<int:category_id>/subcategories', methods=['GET'])
+def category_subcategories(category_id):
+    ref = get_reference_data()
+    if category_id not in ref.category_by_id:
+        return jsonify(error=f'No category {category_id}'), 404
+    return _reference_json(ref, category_id=category_id, subcategories=[
+        _child_to_dict(row) for row in ref.subcategories_by_category.get(category_id, ())])
+
+def _date_arg(name, default=None):
+    value = request.args.get(name)
+    if not value:
+        if default is None:
+            raise ValueError(f'Missing {name}')
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name} (expected YYYY-MM-DD)')
+
+def _movement_to_dict(movement):
+    return {
+        'id': movement.id,
+        'asset_id': movement.asset_id,
+        'movement_date': movement.movement_date.isoformat(),
+        'from_location_id': movement.from_location_id,
+        'from_sublocation_id': movement.from_sublocation_id,
+        'to_location_id': movement.to_location_id,
+        'to_sublocation_id': movement.to_sublocation_id,
+        'old_serial': movement.old_serial,
+        'new_serial': movement.new_serial,
+    }
+
+@main.route('/api/assets/<int:asset_id>/location', methods=['GET'])
+def asset_location_as_of(asset_id):
+    asset = Asset.query.get_or_404(asset_id)
+    try:
+        as_of = _date_arg('as_of', date.today())
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    position = location_as_of(asset, as_of)
+    location_id, sublocation_id, serial_number = position or (None, None, None)
+    return jsonify(asset_id=asset_id, as_of=as_of.isoformat(), location_id=location_id,
+                   sublocation_id=sublocation_id, serial_number=serial_number)
+
+@main.route('/api/assets/<int:asset_id>/movements', methods=['GET'])
+def asset_movements(asset_id):
+    Asset.query.get_or_404(asset_id)
+    return jsonify(asset_id=asset_id, movements=[_movement_to_dict(m) for m in asset_timeline(asset_id)])
+
+@main.route('/api/locations/<int:location_id>/assets', methods=['GET'])
+def location_occupancy(location_id):
+    if location_id not in get_reference_data().location_by_id:
+        abort(404)
+    try:
+        as_of = _date_arg('as_of', date.today())
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    sublocation_id = request.args.get('sublocation', type=int)
+    rows = occupancy_as_of(location_id, as_of, sublocation_id=sublocation_id)
+    return jsonify(location_id=location_id, sublocation_id=sublocation_id, as_of=as_of.isoformat(), count=len(rows),
+                   assets=[{'id': asset_id, 'serial_number': serial} for asset_id, serial in rows])
+
+@main.route('/api/locations/<int:location_id>/movements', methods=['GET'])
+def location_movements(location_id):
+    if location_id not in get_reference_data().location_by_id:
+        abort(404)
+    try:
+        start = _date_arg('start')
+        end = _date_arg('end', date.today())
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(location_id=location_id, start=start.isoformat(), end=end.isoformat(),
+                   movements=[_movement_to_dict(m) for m in movements_between(location_id, start, end)])
+
+@main.route('/schedule_maintenance', methods=['POST'])
 def schedule_maintenance():
     try:
         asset_id = int(request.form['asset_id'])
@@ -267,67 +494,155 @@ def schedule_maintenance():
         maintenance_type = request.form['type']
         description = request.form.get('description', '')
 
-        maintenance = Maintenance(
-            asset_id=asset_id,
-            start_date=start_date,
-            end_date=end_date,
-            type=maintenance_type,
-            description=description
-        )
-        db.session.add(maintenance)
+        asset = Asset.query.get_or_404(asset_id)
+        schedule_window(asset, start_date, end_date, maintenance_type, description)
         db.session.commit()
 
         flash('Maintenance scheduled successfully!', 'success')
-        return redirect(url_for('asset_detail', asset_id=asset_id))
+        return redirect(url_for('main.asset_detail', asset_id=asset_id))
+    except MaintenanceConflict as e:
+        db.session.rollback()
+        flash(f'Maintenance not scheduled: {str(e)}', 'error')
+        return redirect(url_for('main.asset_detail', asset_id=asset_id))
     except Exception as e:
         db.session.rollback()
         flash(f'Error scheduling maintenance: {str(e)}', 'error')
-        return redirect(url_for('asset_detail', asset_id=int(request.form.get('asset_id', 0))))
+        return redirect(url_for('main.asset_detail', asset_id=int(request.form.get('asset_id', 0))))
+
+@main.route('/maintenance/<int:maintenance_id>/close', methods=['POST'])
+def close_maintenance(maintenance_id):
+    maintenance = Maintenance.query.get_or_404(maintenance_id)
+    try:
+        end_date_str = request.form.get('end_date', '')
+        close_window(maintenance, date.fromisoformat(end_date_str) if end_date_str else None)
+        db.session.commit()
+        flash('Maintenance closed.', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(f'Error closing maintenance: {str(e)}', 'error')
+    return redirect(url_for('main.maintenance_history', asset_id=maintenance.asset_id))
 
-@app.route('/maintenance_history/<int:asset_id>', methods=['GET'])
+@main.route('/maintenance_history/<int:asset_id>', methods=['GET'])
 def maintenance_history(asset_id):
     asset = Asset.query.get_or_404(asset_id)
-    maintenance_records = Maintenance.query.filter_by(asset_id=asset_id).all()
+    maintenance_records = (Maintenance.query.filter_by(asset_id=asset_id)
+                           .order_by(Maintenance.start_date.desc(), Maintenance.id.desc()).all())
     return render_template('maintenance_history.html', asset=asset, maintenance_records=maintenance_records)
 
-@app.route('/regenerate_barcode/<int:asset_id>', methods=['GET'])
-def regenerate_barcode(asset_id):
-    asset = Asset.query.get_or_404(asset_id)
+def _window_to_dict(window, assets, overdue_days, today):
+    asset = assets[window.asset_id]
+    return {
+        'id': window.id,
+        'asset_id': window.asset_id,
+        'serial_number': asset.serial_number,
+        'asset_name': asset.name,
+        'location_id': asset.location_id,
+        'start_date': window.start_date.isoformat(),
+        'end_date': window.end_date.isoformat() if window.end_date else None,
+        'type': window.type,
+        'description': window.description,
+        'open_ended': window.end_date is None,
+        'overdue': is_overdue(window, overdue_days, today),
+    }
+
+@main.route('/api/maintenance/calendar', methods=['GET'])
+def maintenance_calendar():
+    today = date.today()
     try:
-        # Get the directory where this file is located
-        app_dir = os.path.dirname(os.path.abspath(__file__))
-        barcode_dir = os.path.join(app_dir, 'static', 'barcodes')
-        os.makedirs(barcode_dir, exist_ok=True)
-        
-        # Generate barcode
-        barcode_path = os.path.join(barcode_dir, asset.serial_number)
-        code128 = Code128(asset.serial_number, writer=ImageWriter())
-        code128.save(barcode_path)
-        
-        flash('Barcode regenerated successfully!', 'success')
-    except Exception as e:
-        flash(f'Error regenerating barcode: {str(e)}', 'error')
-    
-    return redirect(url_for('asset_detail', asset_id=asset_id))
+        start = _date_arg('start', today)
+        end = _date_arg('end', start + timedelta(days=30))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if end < start:
+        return jsonify(error='end must not be before start'), 400
+    location_id = request.args.get('location', type=int)
+    offset = request.args.get('open_ended_offset', 0, type=int)
+    if offset < 0:
+        return jsonify(error='open_ended_offset must not be negative'), 400
+    per_page = current_app.config['MAINTENANCE_OPEN_ENDED_PER_PAGE']
+
+    # Open-ended jobs started earlier come in pages of their own below
+    windows = calendar(start, end, location_id, earlier_open_ended=False)
+    # One extra row tells whether another page follows
+    unfinished = open_ended(end, location_id, per_page + 1, offset)
+    more = len(unfinished) > per_page
+    unfinished = unfinished[:per_page]
+    asset_ids = {window.asset_id for window in windows} | {window.asset_id for window in unfinished}
+    assets = {}
+    for chunk in batched(sorted(asset_ids), IN_CHUNK_SIZE):
+        assets.update((asset.id, asset) for asset in Asset.query.filter(Asset.id.in_(chunk)))
+
+    overdue_days = current_app.config['MAINTENANCE_OVERDUE_DAYS']
+    unfinished = [_window_to_dict(window, assets, overdue_days, today) for window in unfinished]
+    return jsonify(
+        start=start.isoformat(), end=end.isoformat(), location_id=location_id,
+        windows=[_window_to_dict(window, assets, overdue_days, today) for window in windows],
+        open_ended=unfinished,
+        open_ended_more=more,
+        overdue=[window for window in unfinished if window['overdue']],
+    )
+
+@main.route('/barcode/<serial_number>.<any(png, svg):fmt>', methods=['GET'])
+def barcode_image(serial_number, fmt):
+    etag = barcode_etag(serial_number, fmt)
+
+    def cached_response(data):
+        response = current_app.response_class(data, mimetype=MIMETYPES[fmt])
+        response.set_etag(etag)
+        # A serial's image never changes; a moved asset gets a new URL
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['BARCODE_HTTP_MAX_AGE']
+        response.cache_control.immutable = True
+        return response
+
+    if etag in request.if_none_match:
+        return cached_response(b'').make_conditional(request)
+
+    cache = get_cache()
+    data = cache.get((serial_number, fmt))
+    if data is None:
+        if not db.session.query(Asset.id).filter_by(serial_number=serial_number).first():
+            abort(404)
+        data = render_barcode(serial_number, fmt)
+        cache.put((serial_number, fmt), data)
 
-@app.route('/depreciation_summary', methods=['GET'])
+    return cached_response(data)
+
+@main.route('/depreciation_summary', methods=['GET', 'POST'])
 def depreciation_summary():
-    assets = Asset.query.all()
-    depreciation_data = []
-
-    for asset in assets:
-        age_in_years = (date.today() - asset.purchased_on).days / 365.25
-        depreciation_value = asset.depreciation * age_in_years
-        book_value = max(asset.purchase_price - depreciation_value, 0)
-        depreciation_data.append({
-            'asset': asset,
-            'depreciation_value': depreciation_value,
-            'book_value': book_value
-        })
-
-    return render_template('depreciation_summary.html', depreciation_data=depreciation_data)
-
-@app.route('/disposal_report', methods=['GET'])
+    if request.method == 'POST':
+        try:
+            as_of = date.fromisoformat(request.form.get('as_of') or date.today().isoformat())
+        except ValueError:
+            flash('Invalid snapshot date.', 'error')
+            return redirect(url_for('main.depreciation_summary'))
+        removed, added = compute_snapshot(as_of)
+        flash(f'Depreciation snapshot for {as_of} updated ({added} assets recomputed, {removed} stale rows replaced).', 'success')
+        return redirect(url_for('main.depreciation_summary', as_of=as_of.isoformat()))
+
+    dates = snapshot_dates()
+    try:
+        as_of = date.fromisoformat(request.args['as_of']) if request.args.get('as_of') else (dates[0] if dates else None)
+    except ValueError:
+        abort(400)
+
+    totals = by_category = by_location = None
+    if as_of in dates:
+        totals = snapshot_totals(as_of)
+        by_category = snapshot_totals(as_of, 'category_id')
+        by_location = snapshot_totals(as_of, 'location_id')
+
+    return render_template('depreciation_summary.html', as_of=as_of, dates=dates, totals=totals,
+                           by_category=by_category, by_location=by_location, ref=get_reference_data(),
+                           today=date.today())
+
+@main.route('/disposal_report', methods=['GET'])
 def disposal_report():
     disposed_assets = Asset.query.filter_by(status='Disposed').all()
     return render_template('disposal_report.html', disposed_assets=disposed_assets)
+
+@main.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    return current_app.response_class(metrics.render_latest(), mimetype=None, content_type=metrics.CONTENT_TYPE)
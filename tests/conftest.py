@@ -0,0 +1,54 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app import create_app
+from app.importer import bulk_insert
+from app.models import db, Asset
+from app.reference_loader import load_reference_data
+from app.refdata import get_reference_data
+from app.serials import allocate_serial_suffixes, format_serial
+
+
+@pytest.fixture
+def app(tmp_path):
+    # A scratch SQLite file per test, with the CSV reference data loaded
+    app = create_app('development', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'assets.db'}")
+    with app.app_context():
+        load_reference_data()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def places(app):
+    """Two ``(location, sublocation)`` pairs in different locations."""
+    ref = get_reference_data()
+    pairs = [(location, ref.sublocations_by_location[location.id][0])
+             for location in ref.locations if ref.sublocations_by_location.get(location.id)]
+    return pairs[0], pairs[1]
+
+
+@pytest.fixture
+def add_assets(app):
+    """Register ``count`` assets at a ``(location, sublocation)`` pair; returns their ids."""
+    def add(count, place):
+        ref = get_reference_data()
+        location, sublocation = place
+        category = next(category for category in ref.categories if ref.subcategories_by_category.get(category.id))
+        subcategory = ref.subcategories_by_category[category.id][0]
+        first = allocate_serial_suffixes(category.id, count)
+        bulk_insert(Asset, [{
+            'name': f'Test asset {i}', 'type': 'Test', 'category_id': category.id,
+            'subcategory_id': subcategory.id, 'location_id': location.id, 'sublocation_id': sublocation.id,
+            'status': 'Active', 'depreciation': 10.0, 'purchased_on': date(2020, 1, 1), 'purchase_cost': 100.0,
+            'serial_number': format_serial(location.code, category.code, sublocation.code, first + i),
+        } for i in range(count)])
+        return db.session.execute(select(Asset.id).order_by(Asset.id.desc()).limit(count)).scalars().all()[::-1]
+    return add
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.models import db, Asset
+
+
+def edit_form(asset, **changes):
+    form = {'name': asset.name, 'type': asset.type, 'status': asset.status, 'version': asset.version}
+    form.update(changes)
+    return form
+
+
+def test_edit_from_an_old_version_is_refused(client, places, add_assets):
+    asset_id, = add_assets(1, places[0])
+    asset = db.session.get(Asset, asset_id)
+    opened = edit_form(asset)
+
+    response = client.post(f'/edit_asset/{asset_id}', data=edit_form(asset, name='First save'))
+    assert response.status_code == 302
+    # The second form was opened before the first save and is now stale
+    response = client.post(f'/edit_asset/{asset_id}', data=dict(opened, name='Second save'),
+                           follow_redirects=True)
+    assert 'changed by someone else' in response.get_data(as_text=True)
+
+    db.session.expire_all()
+    asset = db.session.get(Asset, asset_id)
+    assert asset.name == 'First save'
+    assert asset.version == opened['version'] + 1
+
+
+def test_update_over_a_newer_version_raises_stale_data(app, places, add_assets):
+    asset_id, = add_assets(1, places[0])
+    asset = db.session.get(Asset, asset_id)
+    # Another writer commits between this session's read and its UPDATE
+    db.session.execute(update(Asset).where(Asset.id == asset_id).values(version=Asset.version + 1),
+                       execution_options={'synchronize_session': False})
+    asset.name = 'Lost update'
+    with pytest.raises(StaleDataError):
+        db.session.flush()
+    db.session.rollback()
+    assert db.session.get(Asset, asset_id).name != 'Lost update'
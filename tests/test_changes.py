@@ -0,0 +1,43 @@
+from app.models import db, Asset
+
+
+def read_feed(client, limit):
+    # Follows next_since page by page, as a consumer does
+    entries, since = [], 0
+    while True:
+        body = client.get(f'/changes?since={since}&limit={limit}').get_json()
+        entries.extend(body['changes'])
+        assert body['next_since'] >= since
+        since = body['next_since']
+        if not body['has_more']:
+            return entries
+
+
+def test_feed_lists_every_change_once_in_seq_order(client, places, add_assets):
+    asset_ids = add_assets(3, places[0])
+    location, sublocation = places[1]
+    client.post('/api/assets/bulk_move', json={
+        'asset_ids': asset_ids[:2], 'location_id': location.id, 'sublocation_id': sublocation.id})
+    asset = db.session.get(Asset, asset_ids[0])
+    client.post(f'/edit_asset/{asset.id}', data={
+        'name': 'Renamed', 'type': asset.type, 'status': asset.status, 'version': asset.version})
+
+    entries = read_feed(client, limit=2)
+    seqs = [entry['seq'] for entry in entries]
+    assert seqs == sorted(set(seqs))
+    assert [(entry['asset_id'], entry['action'], entry['version']) for entry in entries] == [
+        (asset_ids[0], 'registered', 1),
+        (asset_ids[1], 'registered', 1),
+        (asset_ids[2], 'registered', 1),
+        (asset_ids[0], 'moved', 2),
+        (asset_ids[1], 'moved', 2),
+        (asset_ids[0], 'updated', 3),
+    ]
+    assert entries[-1]['data']['name'] == 'Renamed'
+
+
+def test_feed_after_the_last_entry_is_empty(client, places, add_assets):
+    add_assets(2, places[0])
+    last = read_feed(client, limit=500)[-1]['seq']
+    body = client.get(f'/changes?since={last}').get_json()
+    assert body == {'changes': [], 'next_since': last, 'has_more': False}
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import movements
+from app.models import db, Asset, AssetChange, AssetMovement
+from app.movements import move_assets
+from app.refdata import get_reference_data
+from app.serials import format_serial, serial_suffix
+
+
+def positions(asset_ids):
+    return db.session.execute(
+        select(Asset.id, Asset.location_id, Asset.sublocation_id, Asset.serial_number, Asset.version)
+        .where(Asset.id.in_(asset_ids)).order_by(Asset.id)).all()
+
+
+def history_counts():
+    return (db.session.scalar(select(func.count()).select_from(AssetMovement)),
+            db.session.scalar(select(func.max(AssetChange.seq))))
+
+
+def test_bulk_move_moves_every_asset(client, places, add_assets):
+    asset_ids = add_assets(3, places[0])
+    location, sublocation = places[1]
+    response = client.post('/api/assets/bulk_move', json={
+        'asset_ids': asset_ids, 'location_id': location.id, 'sublocation_id': sublocation.id})
+    assert response.status_code == 200
+    assert response.get_json()['moved'] == 3
+
+    db.session.expire_all()
+    for _, location_id, sublocation_id, serial, version in positions(asset_ids):
+        assert (location_id, sublocation_id, version) == (location.id, sublocation.id, 2)
+        assert serial.startswith(f'{location.code}-')
+    assert db.session.scalar(select(func.count()).select_from(AssetMovement)) == 3
+
+
+def test_bulk_move_with_a_missing_asset_moves_nothing(client, places, add_assets):
+    asset_ids = add_assets(3, places[0])
+    before, history = positions(asset_ids), history_counts()
+    location, sublocation = places[1]
+    response = client.post('/api/assets/bulk_move', json={
+        'asset_ids': asset_ids + [999999], 'location_id': location.id, 'sublocation_id': sublocation.id})
+
+    assert response.status_code == 409
+    body = response.get_json()
+    assert (body['ok'], body['moved'], body['skipped'], body['error']) == (False, 0, 3, 1)
+    db.session.expire_all()
+    assert positions(asset_ids) == before
+    assert history_counts() == history
+
+
+def test_bulk_move_with_a_serial_clash_moves_nothing(app, places, add_assets):
+    asset_ids = add_assets(2, places[0])
+    location, sublocation = places[1]
+    # Take the serial the second asset would get at the destination
+    clash = db.session.get(Asset, asset_ids[1])
+    category = get_reference_data().category_by_id[clash.category_id]
+    serial = format_serial(location.code, category.code, sublocation.code, serial_suffix(clash.serial_number))
+    blocker, = add_assets(1, places[1])
+    db.session.execute(update(Asset).where(Asset.id == blocker).values(serial_number=serial))
+    db.session.commit()
+    before, history = positions(asset_ids), history_counts()
+
+    ok, results = move_assets(location.id, sublocation.id, asset_ids=asset_ids)
+    db.session.rollback()
+
+    assert not ok
+    assert [result.status for result in results] == ['skipped', 'error']
+    assert positions(asset_ids) == before
+    assert history_counts() == history
+
+
+def test_move_of_an_asset_changed_since_it_was_read_raises(app, places, add_assets, monkeypatch):
+    asset_ids = add_assets(2, places[0])
+    before, history = positions(asset_ids), history_counts()
+    load_assets = movements._load_assets
+
+    def load_then_edit(column, keys):
+        # Someone edits the second asset after the move has read it
+        assets = load_assets(column, keys)
+        db.session.execute(update(Asset).where(Asset.id == asset_ids[1]).values(version=Asset.version + 1))
+        return assets
+
+    monkeypatch.setattr(movements, '_load_assets', load_then_edit)
+    location, sublocation = places[1]
+    with pytest.raises(StaleDataError):
+        move_assets(location.id, sublocation.id, asset_ids=asset_ids)
+    db.session.rollback()
+    assert positions(asset_ids) == before
+    assert history_counts() == history
@@ -0,0 +1,11 @@
+from app.devtools.datagen import generate
+from app.devtools.query_plans import check_query_plans
+from app.models import db
+
+
+def test_hot_queries_use_indexes(app):
+    # A scratch database with the full installed schema and a generated
+    # register, rather than the bare models
+    generate(500, movement_rate=0.3, maintenance_rate=0.25, seed=42, batch_size=100)
+    assert check_query_plans(db.engine) == 0
+
@@ -0,0 +1,30 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from sqlalchemy import select
+
+from app.devtools.load_test import load_app, seed, writer
+from app.models import db, Asset
+from app.serials import serial_suffix
+
+
+def test_concurrent_registrations_get_distinct_serials(tmp_path):
+    # Separate processes registering through the app against one SQLite
+    # file, as gunicorn workers do under the production profile
+    database_url = f"sqlite:///{tmp_path / 'assets.db'}"
+    seed(database_url, 'development', 10)
+    start_at = time.time() + 3  # after the workers have imported the app
+    with ProcessPoolExecutor(max_workers=2, mp_context=get_context('spawn')) as pool:
+        futures = [pool.submit(writer, database_url, 'production', start_at, start_at + 1) for _ in range(2)]
+        results = [future.result() for future in futures]
+
+    assert all(failed == 0 for _, failed in results)
+    committed = sum(count for count, _ in results)
+    assert committed > 0
+    with load_app(database_url, 'production').app_context():
+        serials = db.session.execute(
+            select(Asset.serial_number).where(Asset.name == 'Load')).scalars().all()
+    assert len(serials) == committed
+    # Seeded serials end in 1-10, so the counter starts at 11; no suffix is lost or handed out twice
+    assert sorted(int(serial_suffix(serial)) for serial in serials) == list(range(11, 11 + committed))